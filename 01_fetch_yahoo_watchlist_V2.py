@@ -13,9 +13,10 @@ from dotenv import load_dotenv
 from config import DEFAULT_ENV_PATH
 from logger_config import setup_logging, get_logger
 
-if Path(DEFAULT_ENV_PATH).exists():
-    load_dotenv(Path(DEFAULT_ENV_PATH))
+if DEFAULT_ENV_PATH.exists():
+    load_dotenv(DEFAULT_ENV_PATH)
 
+from file_utils import read_json
 from watchlist_loader import load_watchlist, get_yahoo_symbols_for_fetch
 from fetch_utils import fetch_stock_data_batch
 from bot import TradingBot
@@ -39,8 +40,7 @@ def load_new_pipeline_cache() -> dict:
     if not NEW_PIPELINE_CACHE.exists():
         return {"stocks": {}, "metadata": {}}
     try:
-        with open(NEW_PIPELINE_CACHE, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        data = read_json(NEW_PIPELINE_CACHE)
         return data if isinstance(data, dict) else {"stocks": {}, "metadata": {}}
     except Exception as e:
         logger.warning("Could not load new pipeline cache: %s", e)
@@ -79,9 +79,10 @@ def main():
     # Tickers we need to fetch (not in cache with data, or refresh)
     to_fetch = [
         t for t in tickers
-        if args.refresh or t not in cached_stocks or not cached_stocks[t].get("data_available", False)
+        if args.refresh or not (cached_stocks.get(t) or {}).get("data_available", False)
     ]
-    skipped = sum(1 for t in tickers if t not in to_fetch)
+    to_fetch_set = set(to_fetch)
+    skipped = total - len(to_fetch)
 
     print(f"\n{'='*80}")
     print("01: FETCH YAHOO WATCHLIST")
@@ -92,24 +93,25 @@ def main():
     print(f"{'='*80}\n")
 
     for i, ticker in enumerate(tickers, 1):
-        if ticker not in to_fetch:
+        if ticker not in to_fetch_set:
             print(f"[{i}/{total}] {ticker:12s} - Using cached")
             continue
         print(f"[{i}/{total}] {ticker:12s} - Queued for batch fetch")
 
     if to_fetch:
         print(f"\nBatch downloading {len(to_fetch)} tickers from Yahoo (threaded)...")
+        fetched_at = datetime.now().isoformat()
         try:
             batch_results = fetch_stock_data_batch(to_fetch, bot, stock_info_workers=6)
         except Exception as e:
             logger.exception("Batch fetch failed")
-            batch_results = {t: {"ticker": t, "error": str(e), "data_available": False, "fetched_at": datetime.now().isoformat()} for t in to_fetch}
+            batch_results = {t: {"ticker": t, "error": str(e), "data_available": False, "fetched_at": fetched_at} for t in to_fetch}
         for ticker in to_fetch:
             result = batch_results.get(ticker) or {
                 "ticker": ticker,
                 "error": "No result from batch",
                 "data_available": False,
-                "fetched_at": datetime.now().isoformat(),
+                "fetched_at": fetched_at,
             }
             cached_stocks[ticker] = result
             if result.get("data_available", False):
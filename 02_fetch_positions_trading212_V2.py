@@ -13,6 +13,8 @@ from dotenv import load_dotenv
 from logger_config import setup_logging, get_logger
 from config import DEFAULT_ENV_PATH
 from ticker_utils import clean_ticker
+from cache_utils import hist_to_cache_dict
+from file_utils import read_json
 from trading212_client import Trading212Client
 from currency_utils import get_eur_usd_rate, get_eur_usd_rate_with_date, warn_if_eur_rate_unavailable
 
@@ -24,8 +26,8 @@ NEW_PIPELINE_POSITIONS = NEW_PIPELINE_DIR / "positions_new_pipeline.json"
 setup_logging(log_level="INFO", log_to_file=True)
 logger = get_logger(__name__)
 
-if Path(DEFAULT_ENV_PATH).exists():
-    load_dotenv(Path(DEFAULT_ENV_PATH))
+if DEFAULT_ENV_PATH.exists():
+    load_dotenv(DEFAULT_ENV_PATH)
 
 
 def _get_ticker_from_position(position: Dict) -> str:
@@ -101,8 +103,7 @@ def load_new_pipeline_cache() -> dict:
     if not NEW_PIPELINE_CACHE.exists():
         return {"stocks": {}, "metadata": {}}
     try:
-        with open(NEW_PIPELINE_CACHE, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return read_json(NEW_PIPELINE_CACHE)
     except Exception as e:
         logger.warning("Could not load new pipeline cache: %s", e)
         return {"stocks": {}, "metadata": {}}
@@ -114,14 +115,10 @@ def save_new_pipeline_cache(data: dict) -> None:
         json.dump(data, f, indent=2, default=str)
 
 
-def refresh_ohlcv_for_tickers(tickers: List[str]) -> None:
-    """Fetch OHLCV for given tickers and merge into new pipeline cache (same structure as 01)."""
-    if not tickers:
-        return
-    from bot import TradingBot
-    bot = TradingBot(skip_trading212=True)
-    cached_data = load_new_pipeline_cache()
-    stocks = cached_data.get("stocks", {})
+def _refresh_ohlcv_per_ticker(bot, tickers: List[str], stocks: Dict[str, Any]) -> None:
+    """Per-ticker fallback: historical + stock_info for each ticker, merged into stocks in place."""
+    # One timestamp for the whole refresh batch
+    fetched_at = datetime.now().isoformat()
     for ticker in tickers:
         logger.info("Refreshing OHLCV for %s", ticker)
         try:
@@ -131,23 +128,20 @@ def refresh_ohlcv_for_tickers(tickers: List[str]) -> None:
                     "ticker": ticker,
                     "error": f"Insufficient data ({len(hist)} rows)",
                     "data_available": False,
-                    "fetched_at": datetime.now().isoformat(),
+                    "fetched_at": fetched_at,
                 }
                 continue
             stock_info = bot.data_provider.get_stock_info(ticker) or {}
-            hist_dict = {"index": [str(idx) for idx in hist.index], "data": hist.to_dict("records")}
+            rate = None
             if stock_info.get("currency") == "EUR":
                 rate = get_eur_usd_rate()
                 if rate and rate > 0:
-                    for row in hist_dict["data"]:
-                        for key in ("Open", "High", "Low", "Close"):
-                            if key in row and row[key] is not None:
-                                row[key] = round(float(row[key]) * rate, 4)
                     for key in ("current_price", "52_week_high", "52_week_low"):
                         if stock_info.get(key) is not None:
                             stock_info[key] = round(float(stock_info[key]) * rate, 4)
                     stock_info["currency"] = "USD"
                     stock_info["original_currency"] = "EUR"
+            hist_dict = hist_to_cache_dict(hist, rate)
             stocks[ticker] = {
                 "ticker": ticker,
                 "data_available": True,
@@ -155,11 +149,37 @@ def refresh_ohlcv_for_tickers(tickers: List[str]) -> None:
                 "stock_info": stock_info,
                 "data_points": len(hist),
                 "date_range": {"start": str(hist.index[0]), "end": str(hist.index[-1])},
-                "fetched_at": datetime.now().isoformat(),
+                "fetched_at": fetched_at,
             }
         except Exception as e:
             logger.warning("Fetch failed for %s: %s", ticker, e)
-            stocks[ticker] = {"ticker": ticker, "error": str(e), "data_available": False, "fetched_at": datetime.now().isoformat()}
+            stocks[ticker] = {"ticker": ticker, "error": str(e), "data_available": False, "fetched_at": fetched_at}
+
+
+def refresh_ohlcv_for_tickers(tickers: List[str]) -> None:
+    """Fetch OHLCV for given tickers and merge into new pipeline cache (same structure as 01)."""
+    if not tickers:
+        return
+    from bot import TradingBot
+    bot = TradingBot(skip_trading212=True)
+    cached_data = load_new_pipeline_cache()
+    stocks = cached_data.get("stocks", {})
+    remaining = tickers
+    # Fast path: one multi-ticker Yahoo download + parallel stock_info (same helper as 01)
+    if hasattr(bot.data_provider, "get_historical_data_batch"):
+        from fetch_utils import fetch_stock_data_batch
+        try:
+            batch_results = fetch_stock_data_batch(tickers, bot)
+        except Exception as e:
+            logger.warning("Batch refresh failed, falling back to per-ticker fetch: %s", e)
+            batch_results = {}
+        for ticker, result in batch_results.items():
+            if result.get("data_available", False):
+                stocks[ticker] = result
+        # Tickers the batch could not serve go through the per-ticker path (ticker formats, Alpha Vantage)
+        remaining = [t for t in tickers if not (batch_results.get(t) or {}).get("data_available", False)]
+    if remaining:
+        _refresh_ohlcv_per_ticker(bot, remaining, stocks)
     cached_data["stocks"] = stocks
     save_new_pipeline_cache(cached_data)
     print(f"  Cache updated for {len(tickers)} position ticker(s).")
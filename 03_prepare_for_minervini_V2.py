@@ -3,11 +3,9 @@ Pipeline step 3/7: Prepare data for Minervini.
 Loads Yahoo cache (01) + positions (02) + watchlist; applies mapping; writes data/prepared_for_minervini.json
 and reportsV2/problems_with_tickers.txt. Data is stored for testing and for step 04.
 """
-import json
 import argparse
-from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Optional
 
 from dotenv import load_dotenv
 from logger_config import setup_logging, get_logger
@@ -16,8 +14,6 @@ from config import (
     PREPARED_FOR_MINERVINI,
     PROBLEMS_WITH_TICKERS,
     REPORTS_DIR,
-    NEW_PIPELINE_CACHE,
-    NEW_PIPELINE_POSITIONS,
 )
 from watchlist_loader import (
     load_watchlist,
@@ -27,41 +23,23 @@ from watchlist_loader import (
     TRADING212_SYMBOL,
     BENCHMARK_INDEX,
 )
-from ticker_utils import clean_ticker
+from cache_utils import load_pipeline_cache, load_pipeline_positions
+from file_utils import dumps_json, write_bytes_atomic
+from ticker_utils import TickerIndex, build_ticker_index, clean_ticker, lookup_ticker_index
 
 setup_logging(log_level="INFO", log_to_file=True)
 logger = get_logger(__name__)
 
-if Path(DEFAULT_ENV_PATH).exists():
-    load_dotenv(Path(DEFAULT_ENV_PATH))
+if DEFAULT_ENV_PATH.exists():
+    load_dotenv(DEFAULT_ENV_PATH)
 
 
-def load_cache() -> Dict[str, Any]:
-    if not NEW_PIPELINE_CACHE.exists():
-        return {"stocks": {}, "metadata": {}}
-    try:
-        with open(NEW_PIPELINE_CACHE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        return data if isinstance(data, dict) else {"stocks": {}, "metadata": {}}
-    except Exception as e:
-        logger.warning("Could not load cache: %s", e)
-        return {"stocks": {}, "metadata": {}}
-
-
-def load_positions() -> List[Dict]:
-    if not NEW_PIPELINE_POSITIONS.exists():
-        return []
-    try:
-        with open(NEW_PIPELINE_POSITIONS, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        return data.get("positions", [])
-    except Exception as e:
-        logger.warning("Could not load positions: %s", e)
-        return []
-
-
-def resolve_cache_entry(symbol: str, stocks: Dict) -> Optional[Dict]:
-    """Find cache entry by yahoo symbol or trading212 symbol (exact, cleaned, trailing D)."""
+def resolve_cache_entry(symbol: str, stocks: Dict, index: Optional[TickerIndex] = None) -> Optional[Dict]:
+    """
+    Find cache entry by yahoo symbol or trading212 symbol (exact, cleaned, trailing D, then any key
+    matching case-insensitively or after cleaning). Pass index = build_ticker_index(stocks), built once
+    per run, so the last step is a hash lookup instead of a scan over every cache key.
+    """
     s = (symbol or "").strip().upper()
     if s in stocks:
         return stocks[s]
@@ -70,24 +48,23 @@ def resolve_cache_entry(symbol: str, stocks: Dict) -> Optional[Dict]:
         return stocks[cleaned]
     if len(s) > 1 and s.endswith("D") and s[:-1] in stocks:
         return stocks[s[:-1]]
-    for key, val in stocks.items():
-        if key.upper() == s or (clean_ticker(key) or key) == cleaned:
-            return val
-    return None
+    return lookup_ticker_index(index if index is not None else build_ticker_index(stocks), s, cleaned)
 
 
 def main():
     parser = argparse.ArgumentParser(description="03: Prepare data for Minervini (stored for testing)")
     parser.add_argument("--watchlist", default="watchlist.csv", help="Watchlist CSV or .txt")
+    parser.add_argument("--pretty", action="store_true", help="Indent the prepared JSON (default compact: smaller, faster to write)")
     args = parser.parse_args()
 
     print(f"\n{'='*80}")
     print("03: PREPARE FOR MINERVINI")
     print(f"{'='*80}")
 
-    cache = load_cache()
+    cache = load_pipeline_cache()
     stocks = cache.get("stocks", {})
-    positions = load_positions()
+    cache_index = build_ticker_index(stocks)
+    positions = load_pipeline_positions()
     rows = load_watchlist(args.watchlist)
     ticker_rows = get_ticker_rows(rows)
 
@@ -95,13 +72,8 @@ def main():
         print("No ticker rows in watchlist. Add type=ticker rows to watchlist.")
         return
 
-    # Build mapping: trading212_symbol -> watchlist row (for problem reporting)
+    # trading212_symbol -> watchlist row (for problem reporting); filled in the main pass
     t212_to_row: Dict[str, Dict] = {}
-    for r in ticker_rows:
-        t212 = (r.get(TRADING212_SYMBOL) or "").strip().upper()
-        if t212:
-            t212_to_row[t212] = r
-
     prepared_stocks: Dict[str, Dict] = {}
     problems: List[str] = []
 
@@ -109,8 +81,10 @@ def main():
         yahoo = (r.get(YAHOO_SYMBOL) or "").strip().upper()
         t212 = (r.get(TRADING212_SYMBOL) or "").strip().upper()
         bench = (r.get(BENCHMARK_INDEX) or "").strip().upper() or "^GDAXI"
+        if t212:
+            t212_to_row[t212] = r
 
-        entry = resolve_cache_entry(yahoo, stocks) or resolve_cache_entry(t212, stocks)
+        entry = resolve_cache_entry(yahoo, stocks, cache_index) or resolve_cache_entry(t212, stocks, cache_index)
         if not entry:
             problems.append(f"No cache data: yahoo={yahoo}, trading212={t212 or '(none)'}")
             continue
@@ -132,7 +106,7 @@ def main():
         if t:
             pos_tickers.add(t)
     for pt in pos_tickers:
-        if pt not in t212_to_row and not resolve_cache_entry(pt, stocks):
+        if pt not in t212_to_row and not resolve_cache_entry(pt, stocks, cache_index):
             problems.append(f"Position not in watchlist / no cache: trading212={pt}")
 
     # Latest Yahoo fetch time from cache (when data was taken from Yahoo)
@@ -141,28 +115,28 @@ def main():
         t = entry.get("fetched_at")
         if t and (data_timestamp_yahoo is None or (isinstance(t, str) and t > data_timestamp_yahoo)):
             data_timestamp_yahoo = t
+    now = datetime.now()
     if not data_timestamp_yahoo:
-        data_timestamp_yahoo = datetime.now().isoformat()
+        data_timestamp_yahoo = now.isoformat()
 
     PREPARED_FOR_MINERVINI.parent.mkdir(parents=True, exist_ok=True)
     prepared_data = {
         "stocks": prepared_stocks,
         "metadata": {
-            "generated_at": datetime.now().isoformat(),
+            "generated_at": now.isoformat(),
             "data_timestamp_yahoo": data_timestamp_yahoo,
             "total_tickers": len(ticker_rows),
             "with_data": len(prepared_stocks),
             "problems_count": len(problems),
         },
     }
-    with open(PREPARED_FOR_MINERVINI, "w", encoding="utf-8") as f:
-        json.dump(prepared_data, f, indent=2, default=str)
+    write_bytes_atomic(PREPARED_FOR_MINERVINI, dumps_json(prepared_data, indent=args.pretty, default=str))
     print(f"Wrote {PREPARED_FOR_MINERVINI} ({len(prepared_stocks)} tickers with data)")
 
     REPORTS_DIR.mkdir(parents=True, exist_ok=True)
     with open(PROBLEMS_WITH_TICKERS, "w", encoding="utf-8") as f:
         f.write("# Problems with tickers (generated by 03_prepare_for_minervini_V2.py)\n")
-        f.write(f"# Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+        f.write(f"# Generated: {now.strftime('%Y-%m-%d %H:%M:%S')}\n\n")
         if problems:
             for line in problems:
                 f.write(line + "\n")
@@ -4,17 +4,21 @@ Reads from data/prepared_for_minervini.json (same as step 04). Does NOT overwrit
 Writes: reportsV2/scan_results_v2_latest.json (LLM/engine output), reportsV2/sepa_scan_user_report_<ts>.txt,
         and optional CSV. Existing pipeline (04→05→06→07) is unchanged.
 """
-import json
+import os
 import sys
 import argparse
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+import numpy as np
 import pandas as pd
 
 from bot import TradingBot
 from minervini_scanner_v2 import MinerviniScannerV2
 from minervini_report_v2 import generate_user_friendly_report, export_scan_summary_to_csv
+from file_utils import dumps_json, json_default, read_json, write_bytes_atomic, write_text_atomic
 from logger_config import setup_logging, get_logger
 from config import (
     PREPARED_FOR_MINERVINI,
@@ -23,54 +27,112 @@ from config import (
     USER_REPORT_SUBDIR_V2,
     SEPA_USER_REPORT_PREFIX,
 )
-from cache_utils import load_cached_data
+from cache_utils import intern_cache_strings, load_cached_data
 
 setup_logging(log_level="INFO", log_to_file=True)
 logger = get_logger(__name__)
 
 
+# OHLCV columns the V2 scanner reads, in frame order
+OHLCV_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+# Accepted spellings per OHLCV column in cached data (first match wins)
+_COLUMN_VARIANTS = {
+    "Open": ["Open", "open", "OPEN"],
+    "High": ["High", "high", "HIGH"],
+    "Low": ["Low", "low", "LOW"],
+    "Close": ["Close", "close", "CLOSE", "Adj Close", "adj close"],
+    "Volume": ["Volume", "volume", "VOLUME", "Vol", "vol"],
+}
+
+
+_CANONICAL_SOURCES = {c: c for c in OHLCV_COLUMNS}
+# Flat variant -> (target column, precedence) map, so each field is looked up once
+_FLAT_COL_MAP = {v: (target, rank) for target, variants in _COLUMN_VARIANTS.items() for rank, v in enumerate(variants)}
+
+
+def _ohlcv_source_keys(fields) -> Optional[Dict[str, str]]:
+    """Cached-data key for each OHLCV column; None if any column is missing."""
+    if fields >= _CANONICAL_SOURCES.keys():
+        # Cache files written by cache_utils already use the canonical names
+        return _CANONICAL_SOURCES
+    best: Dict[str, Tuple[str, int]] = {}
+    for field in fields:
+        hit = _FLAT_COL_MAP.get(field)
+        if hit is not None:
+            target, rank = hit
+            current = best.get(target)
+            if current is None or rank < current[1]:
+                best[target] = (field, rank)
+    if len(best) < len(OHLCV_COLUMNS):
+        return None
+    return {target: best[target][0] for target in OHLCV_COLUMNS}
+
+
+OhlcvArrays = Tuple[np.ndarray, Optional[pd.Index]]
+
+
+@lru_cache(maxsize=64)
+def _parse_cached_index(index_strings: Tuple[str, ...]) -> pd.DatetimeIndex:
+    """
+    Parse a cache 'index' list (tz-offset strings) to a UTC DatetimeIndex, once per distinct list.
+    Tickers on the same exchange share their trading calendar, so most lookups are cache hits.
+    """
+    return pd.to_datetime(list(index_strings), utc=True)
+
+
+def _cached_ohlcv_arrays(cached_stock: Dict) -> Optional[OhlcvArrays]:
+    """Extract the OHLCV block (rows x 5 float64, uncleaned) and parsed index from cached data; None if unusable."""
+    hist_dict = cached_stock.get("historical_data", {})
+    if not hist_dict or "data" not in hist_dict:
+        return None
+    data = hist_dict["data"]
+    # data is records (cache format) or column lists; read the field names once
+    is_columns = isinstance(data, dict)
+    fields = data.keys() if is_columns else (data[0].keys() if data else frozenset())
+    sources = _ohlcv_source_keys(fields)
+    if sources is None:
+        return None
+    # Build only the OHLCV columns, straight into float64 arrays (no full-width frame, no renames),
+    # stacked into the single 2D block the frame wraps (no per-column blocks to consolidate)
+    if is_columns:
+        columns = [np.asarray(data[key], dtype=np.float64) for key in sources.values()]
+    else:
+        columns = [np.array([row.get(key) for row in data], dtype=np.float64) for key in sources.values()]
+    values = np.column_stack(columns)
+    # Parse the index before construction so the frame is built once with it
+    index = None
+    if "index" in hist_dict and hist_dict["index"]:
+        index = _parse_cached_index(tuple(hist_dict["index"]))
+    else:
+        date_key = "Date" if "Date" in fields else next(
+            (f for f in fields if "date" in f.lower() or "time" in f.lower()), None
+        )
+        if date_key is not None:
+            dates = data[date_key] if is_columns else [row.get(date_key) for row in data]
+            index = pd.to_datetime(dates) if date_key == "Date" else pd.to_datetime(dates, utc=True)
+            index.name = date_key
+    return values, index
+
+
+def _ohlcv_frame(values: np.ndarray, index: Optional[pd.Index]) -> Optional[pd.DataFrame]:
+    """Wrap extracted OHLCV arrays in the scanner's DataFrame; None if fewer than 200 clean rows."""
+    df = pd.DataFrame(values, index=index, columns=OHLCV_COLUMNS, copy=False)
+    # Drop rows with NaN in OHLCV (e.g. from Yahoo); otherwise rolling(SMA) and trend checks fail
+    df = df.dropna()
+    if len(df) < 200:
+        return None
+    # Ensure chronological order (oldest first) so iloc[-1] = latest and SMAs are correct
+    df = df.sort_index(ascending=True)
+    return df
+
+
 def convert_cached_data_to_dataframe(cached_stock: Dict) -> Optional[pd.DataFrame]:
     """Convert cached historical data to DataFrame (same logic as 04, for V2 use)."""
     try:
-        hist_dict = cached_stock.get("historical_data", {})
-        if not hist_dict or "data" not in hist_dict:
+        arrays = _cached_ohlcv_arrays(cached_stock)
+        if arrays is None:
             return None
-        data = hist_dict["data"]
-        df = pd.DataFrame(data)
-        if "index" in hist_dict and hist_dict["index"]:
-            df.index = pd.to_datetime(hist_dict["index"], utc=True)
-        elif "Date" in df.columns:
-            df.index = pd.to_datetime(df["Date"])
-            df = df.drop("Date", axis=1)
-        else:
-            for col in df.columns:
-                if "date" in col.lower() or "time" in col.lower():
-                    df.index = pd.to_datetime(df[col], utc=True)
-                    df = df.drop(col, axis=1)
-                    break
-        df.columns = [col.capitalize() if col.lower() in ["open", "high", "low", "close", "volume"] else col for col in df.columns]
-        col_mapping = {
-            "Open": ["Open", "open", "OPEN"],
-            "High": ["High", "high", "HIGH"],
-            "Low": ["Low", "low", "LOW"],
-            "Close": ["Close", "close", "CLOSE", "Adj Close", "adj close"],
-            "Volume": ["Volume", "volume", "VOLUME", "Vol", "vol"],
-        }
-        for target_col, variations in col_mapping.items():
-            for var in variations:
-                if var in df.columns and target_col not in df.columns:
-                    df = df.rename(columns={var: target_col})
-        required_cols = ["Open", "High", "Low", "Close", "Volume"]
-        if any(c not in df.columns for c in required_cols):
-            return None
-        df = df[required_cols].copy()
-        # Drop rows with NaN in OHLCV (e.g. from Yahoo); otherwise rolling(SMA) and trend checks fail
-        df = df.dropna(subset=required_cols)
-        if len(df) < 200:
-            return None
-        # Ensure chronological order (oldest first) so iloc[-1] = latest and SMAs are correct
-        df = df.sort_index(ascending=True)
-        return df
+        return _ohlcv_frame(*arrays)
     except Exception as e:
         logger.debug("Convert cached to DataFrame failed: %s", e)
         return None
@@ -82,14 +144,66 @@ class CachedDataProviderV2:
     def __init__(self, cached_stocks: Dict, original_provider):
         self.cached_stocks = cached_stocks
         self.original_provider = original_provider
+        # ticker -> converted DataFrame; the scan reads each ticker (and its benchmark) several times
+        self._df_cache: Dict[str, pd.DataFrame] = {}
+        # ticker -> arrays extracted by get_raw_ohlcv, consumed when the frame is first needed
+        self._raw_cache: Dict[str, OhlcvArrays] = {}
 
-    def get_historical_data(self, ticker: str, period: str = "1y", interval: str = "1d"):
+    def _extract_arrays(self, ticker: str) -> Optional[OhlcvArrays]:
+        arrays = self._raw_cache.pop(ticker, None)
+        if arrays is not None:
+            return arrays
         if ticker in self.cached_stocks and self.cached_stocks[ticker].get("data_available", False):
-            hist = convert_cached_data_to_dataframe(self.cached_stocks[ticker])
+            try:
+                return _cached_ohlcv_arrays(self.cached_stocks[ticker])
+            except Exception as e:
+                logger.debug("Extract cached OHLCV for %s failed: %s", ticker, e)
+        return None
+
+    def get_historical_data(self, ticker: str, period: str = "1y", interval: str = "1d"):
+        hist = self._df_cache.get(ticker)
+        if hist is not None:
+            return hist
+        arrays = self._extract_arrays(ticker)
+        if arrays is not None:
+            try:
+                hist = _ohlcv_frame(*arrays)
+            except Exception as e:
+                logger.debug("Convert cached to DataFrame failed: %s", e)
+                hist = None
             if hist is not None and not hist.empty:
+                self._df_cache[ticker] = hist
                 return hist
         return self.original_provider.get_historical_data(ticker, period, interval)
 
+    def get_raw_ohlcv(
+        self, ticker: str
+    ) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, Optional[pd.Index]]]:
+        """
+        Clean (NaN rows dropped, oldest first) Open/High/Low/Close/Volume arrays and index without
+        building a DataFrame; None when the ticker has no usable cached data (callers fall back to
+        get_historical_data). The extracted arrays are kept so a later get_historical_data reuses them.
+        """
+        hist = self._df_cache.get(ticker)
+        if hist is not None:
+            values, index = hist.to_numpy(), hist.index
+        else:
+            arrays = self._extract_arrays(ticker)
+            if arrays is None:
+                return None
+            self._raw_cache[ticker] = arrays
+            values, index = arrays
+            keep = ~np.isnan(values).any(axis=1)
+            if not keep.all():
+                values = values[keep]
+                index = index[keep] if index is not None else None
+            if len(values) < 200:
+                return None
+            if index is not None and not index.is_monotonic_increasing:
+                order = index.argsort()
+                values, index = values[order], index[order]
+        return (values[:, 0], values[:, 1], values[:, 2], values[:, 3], values[:, 4], index)
+
     def get_stock_info(self, ticker: str):
         if ticker in self.cached_stocks and self.cached_stocks[ticker].get("stock_info"):
             return self.cached_stocks[ticker]["stock_info"]
@@ -99,24 +213,40 @@ class CachedDataProviderV2:
         return self.original_provider.calculate_relative_strength(ticker, benchmark, period)
 
 
-def sanitize_for_json(obj):
-    """Convert numpy/datetime to JSON-serializable."""
-    import numpy as np
-    if isinstance(obj, dict):
-        return {k: sanitize_for_json(v) for k, v in obj.items()}
-    if isinstance(obj, list):
-        return [sanitize_for_json(v) for v in obj]
-    if isinstance(obj, (np.integer, np.int64, np.int32)):
-        return int(obj)
-    if isinstance(obj, (np.floating, np.float64, np.float32)):
-        return float(obj)
-    if isinstance(obj, np.bool_):
-        return bool(obj)
-    if hasattr(obj, "isoformat"):
-        return obj.isoformat()
-    if obj is None or isinstance(obj, (str, int, float, bool)):
-        return obj
-    return str(obj)
+# Per-process scanner for --jobs > 1 (built once per worker by _init_scan_worker)
+_worker_scanner: Optional[MinerviniScannerV2] = None
+
+
+def _init_scan_worker(stocks: Dict, benchmark: str) -> None:
+    global _worker_scanner
+    bot = TradingBot(skip_trading212=True, benchmark=benchmark)
+    _worker_scanner = MinerviniScannerV2(CachedDataProviderV2(stocks, bot.data_provider), benchmark=benchmark)
+
+
+def _scan_in_worker(job: Tuple[str, str, Optional[float], Optional[float]]) -> Dict:
+    ticker, bench, rs_percentile, rs_3m = job
+    return _worker_scanner.scan_stock(
+        ticker, benchmark_override=bench, rs_percentile=rs_percentile, rs_3m_return=rs_3m, rs_6m_return=None
+    )
+
+
+def scan_universe_parallel(
+    scanner: MinerviniScannerV2,
+    stocks: Dict,
+    tickers: List[str],
+    benchmark_overrides: Optional[Dict[str, str]],
+    jobs: int,
+) -> List[Dict]:
+    """
+    Same results as scanner.scan_universe, with the per-ticker scans (phase 2) spread over `jobs` processes.
+    The universe RS percentiles (phase 1) need every ticker, so they are computed here first.
+    """
+    returns_3m, percentiles = scanner.universe_rs_3m(tickers)
+    overrides = benchmark_overrides or {}
+    work = [(t, overrides.get(t) or scanner.benchmark, percentiles.get(t), returns_3m.get(t)) for t in tickers]
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_scan_worker, initargs=(stocks, scanner.benchmark)) as ex:
+        # Results come back in ticker order, as with the in-process scan
+        return list(ex.map(_scan_in_worker, work, chunksize=max(1, len(work) // (jobs * 4))))
 
 
 def main():
@@ -125,14 +255,14 @@ def main():
     parser.add_argument("--tickers", type=str, help="Comma-separated tickers")
     parser.add_argument("--benchmark", default="^GDAXI", type=str, help="Default benchmark for RS")
     parser.add_argument("--csv", action="store_true", help="Also export CSV summary")
+    parser.add_argument("--jobs", type=int, default=1, help="Processes for the per-ticker scan (default 1 = in-process, 0 = one per CPU)")
     args = parser.parse_args()
 
     # Load data: prefer prepared, else legacy cache
     cached_data = None
     if PREPARED_FOR_MINERVINI.exists():
         try:
-            with open(PREPARED_FOR_MINERVINI, "r", encoding="utf-8") as f:
-                cached_data = json.load(f)
+            cached_data = read_json(PREPARED_FOR_MINERVINI)
         except Exception as e:
             logger.warning("Could not load prepared data: %s", e)
     if cached_data is None:
@@ -143,6 +273,9 @@ def main():
 
     data_timestamp = (cached_data.get("metadata") or {}).get("data_timestamp_yahoo") or (cached_data.get("metadata") or {}).get("generated_at")
     stocks = cached_data["stocks"]
+    # Only the metadata read above and the selected stocks are used from here on; dropping the parsed
+    # document lets a --ticker/--tickers subset free every other entry before the scan (and worker fork)
+    del cached_data
     if args.tickers:
         allowed = {t.strip().upper() for t in args.tickers.split(",") if t.strip()}
         stocks = {k: v for k, v in stocks.items() if k.upper() in allowed}
@@ -152,47 +285,66 @@ def main():
             sys.exit(1)
         stocks = {args.ticker: stocks[args.ticker]}
 
-    tickers = [t for t in stocks if stocks[t].get("data_available", False)]
+    # Index dates and benchmark names repeat across tickers; keep one string object per value
+    intern_cache_strings(stocks)
+
+    # One pass over the cache: scannable tickers and their per-ticker benchmark (if any)
+    tickers = []
+    benchmark_overrides = {}
+    for t, entry in stocks.items():
+        if not entry.get("data_available", False):
+            continue
+        tickers.append(t)
+        bench = entry.get("benchmark_index")
+        if bench:
+            benchmark_overrides[t] = bench
     if not tickers:
         logger.error("No tickers with data_available in cache")
         sys.exit(1)
 
-    benchmark_overrides = {t: stocks[t].get("benchmark_index") for t in tickers if stocks[t].get("benchmark_index")}
     bot = TradingBot(skip_trading212=True, benchmark=args.benchmark)
     provider = CachedDataProviderV2(stocks, bot.data_provider)
     scanner = MinerviniScannerV2(provider, benchmark=args.benchmark)
 
     print(f"SEPA V2 Scan: {len(tickers)} tickers")
-    results = scanner.scan_universe(tickers, benchmark_overrides or None)
-    print(f"Scan complete: {len(results)} results")
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    if jobs > 1 and len(tickers) > 1:
+        results = scan_universe_parallel(scanner, stocks, tickers, benchmark_overrides or None, jobs)
+    else:
+        results = scanner.scan_universe(tickers, benchmark_overrides or None)
+    # Status lines after the scan are collected and written to the console once at the end
+    summary = [f"Scan complete: {len(results)} results"]
 
     # Write LLM/engine JSON (single source of truth)
     REPORTS_DIR_V2.mkdir(parents=True, exist_ok=True)
-    with open(SCAN_RESULTS_V2_LATEST, "w", encoding="utf-8") as f:
-        json.dump(sanitize_for_json(results), f, indent=2, ensure_ascii=False)
+    # Serialized in one pass; json_default only sees values the serializer can't handle natively
+    write_bytes_atomic(SCAN_RESULTS_V2_LATEST, dumps_json(results, indent=True, default=json_default))
     logger.info("Wrote %s", SCAN_RESULTS_V2_LATEST)
 
     # User-friendly report (report_run_timestamp = when this report is generated)
-    report_run_ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    # One clock read for the report header and the output filename
+    now = datetime.now()
+    report_run_ts = now.strftime("%Y-%m-%d %H:%M:%S")
     report_txt = generate_user_friendly_report(
         results,
         data_timestamp=data_timestamp,
         report_run_timestamp=report_run_ts,
     )
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+    ts = now.strftime("%Y%m%d_%H%M%S")
     report_dir = REPORTS_DIR_V2 / USER_REPORT_SUBDIR_V2 if USER_REPORT_SUBDIR_V2 else REPORTS_DIR_V2
     report_dir.mkdir(parents=True, exist_ok=True)
     report_file = report_dir / f"{SEPA_USER_REPORT_PREFIX}{ts}.txt"
-    report_file.write_text(report_txt, encoding="utf-8")
+    write_text_atomic(report_file, report_txt)
     # Avoid printing full report to console (contains Unicode e.g. ≥) which can fail on Windows cp1252
-    print(f"\nUser report saved: {report_file} ({len(report_txt)} chars)")
+    summary.append(f"\nUser report saved: {report_file} ({len(report_txt)} chars)")
 
     if args.csv:
         csv_path = report_dir / f"sepa_scan_summary_{ts}.csv"
         export_scan_summary_to_csv(results, csv_path)
-        print(f"CSV saved: {csv_path}")
+        summary.append(f"CSV saved: {csv_path}")
 
-    print("\nV2 scan complete. Use scan_results_v2_latest.json for LLM/ChatGPT pipeline.")
+    summary.append("\nV2 scan complete. Use scan_results_v2_latest.json for LLM/ChatGPT pipeline.")
+    print("\n".join(summary))
 
 
 if __name__ == "__main__":
@@ -5,22 +5,28 @@ Outputs reportsV2/prepared_existing_positions_v2.json and prepared_new_positions
 A+/A from V2 grade (eligible + grade in A+, A). New positions payload includes V2 structured fields for LLM.
 """
 import argparse
-import json
-import math
+from itertools import chain
 from pathlib import Path
-from datetime import datetime
+from datetime import date, datetime
 from typing import Dict, List, Optional
 
+import numpy as np
 from dotenv import load_dotenv
 from logger_config import setup_logging, get_logger
-from config import DEFAULT_ENV_PATH, PREPARED_FOR_MINERVINI, REPORTS_DIR_V2, SCAN_RESULTS_V2_LATEST
-from currency_utils import get_eur_usd_rate_with_date
-from ticker_utils import clean_ticker
+from config import (
+    DEFAULT_ENV_PATH,
+    NEW_PIPELINE_CACHE,
+    NEW_PIPELINE_POSITIONS,
+    PREPARED_FOR_MINERVINI,
+    REPORTS_DIR_V2,
+    SCAN_RESULTS_V2_LATEST,
+)
+from cache_utils import hist_columns, load_pipeline_cache, load_pipeline_positions
+from currency_utils import get_eur_usd_rate_with_date_cached
+from file_utils import dumps_json, outputs_up_to_date, read_json, read_json_cached, write_bytes_atomic
+from ticker_utils import TickerIndex, build_ticker_index, clean_ticker, lookup_ticker_index
 from watchlist_loader import load_watchlist, TRADING212_SYMBOL, YAHOO_SYMBOL
 
-NEW_PIPELINE_DIR = Path("data")
-NEW_PIPELINE_CACHE = NEW_PIPELINE_DIR / "cached_stock_data_new_pipeline.json"
-NEW_PIPELINE_POSITIONS = NEW_PIPELINE_DIR / "positions_new_pipeline.json"
 V2_REPORTS = REPORTS_DIR_V2  # All V2 reports in reportsV2
 PREPARED_EXISTING_V2 = V2_REPORTS / "prepared_existing_positions_v2.json"
 PREPARED_NEW_V2 = V2_REPORTS / "prepared_new_positions_v2.json"
@@ -29,8 +35,8 @@ MAX_OHLCV_DAYS_6MO = 126
 setup_logging(log_level="INFO", log_to_file=True)
 logger = get_logger(__name__)
 
-if Path(DEFAULT_ENV_PATH).exists():
-    load_dotenv(Path(DEFAULT_ENV_PATH))
+if DEFAULT_ENV_PATH.exists():
+    load_dotenv(DEFAULT_ENV_PATH)
 
 
 def load_scan_results_v2() -> List[Dict]:
@@ -38,64 +44,70 @@ def load_scan_results_v2() -> List[Dict]:
     if not SCAN_RESULTS_V2_LATEST.exists():
         return []
     try:
-        with open(SCAN_RESULTS_V2_LATEST, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        data = read_json_cached(SCAN_RESULTS_V2_LATEST)
         return data if isinstance(data, list) else []
     except Exception as e:
         logger.warning("Could not load V2 scan results: %s", e)
         return []
 
 
-def load_cache() -> dict:
-    if not NEW_PIPELINE_CACHE.exists():
-        return {"stocks": {}}
-    try:
-        with open(NEW_PIPELINE_CACHE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception as e:
-        logger.warning("Could not load cache: %s", e)
-        return {"stocks": {}}
+_PRICE_KEYS = ("Open", "High", "Low", "Close")
+OHLCV_CSV_HEADER = "Date, Open, High, Low, Close, Volume"
+_OHLCV_ROW = "%s, %s, %s, %s, %s, %s".__mod__
 
 
-def load_positions() -> List[Dict]:
-    if not NEW_PIPELINE_POSITIONS.exists():
-        return []
-    try:
-        with open(NEW_PIPELINE_POSITIONS, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        return data.get("positions", [])
-    except Exception as e:
-        logger.warning("Could not load positions: %s", e)
-        return []
+def _aligned(columns: Dict[str, list], n: int) -> bool:
+    """All columns hold n days (a hand-edited or partly migrated cache entry may not; its days cannot be lined up)."""
+    return all(len(col) == n for col in columns.values())
 
 
-def ohlcv_to_csv_rows(hist_dict: dict, to_eur: bool = False, eur_rate: Optional[float] = None, max_days: Optional[int] = None) -> List[str]:
+def ohlcv_to_csv(hist_dict: dict, to_eur: bool = False, eur_rate: Optional[float] = None, max_days: Optional[int] = None) -> str:
+    """OHLCV history as CSV text (header line + one line per day); "" when there is no data."""
     if not hist_dict or "data" not in hist_dict:
-        return []
-    index = list(hist_dict.get("index") or [])
-    data = list(hist_dict["data"])
-    if max_days and len(data) > max_days:
-        data = data[-max_days:]
-        index = index[-max_days:] if len(index) >= max_days else index[-len(data):]
-    rows = []
-    for i, rec in enumerate(data):
-        date_str = index[i] if i < len(index) else ""
-        if hasattr(rec.get("Date"), "strftime"):
-            date_str = rec["Date"].strftime("%Y-%m-%d") if rec.get("Date") else date_str
-        o, h, l_, c = rec.get("Open"), rec.get("High"), rec.get("Low"), rec.get("Close")
-        v = rec.get("Volume", 0)
-        if to_eur and eur_rate and eur_rate > 0:
-            o = round(float(o) / eur_rate, 4) if o is not None else None
-            h = round(float(h) / eur_rate, 4) if h is not None else None
-            l_ = round(float(l_) / eur_rate, 4) if l_ is not None else None
-            c = round(float(c) / eur_rate, 4) if c is not None else None
-        else:
-            o = round(float(o), 4) if o is not None else None
-            h = round(float(h), 4) if h is not None else None
-            l_ = round(float(l_), 4) if l_ is not None else None
-            c = round(float(c), 4) if c is not None else None
-        rows.append(f"{date_str}, {o}, {h}, {l_}, {c}, {v}")
-    return rows
+        return ""
+    index = hist_dict.get("index") or []  # only sliced below, never modified: no copy
+    columns = hist_columns(hist_dict)
+    n = len(next(iter(columns.values()), ()))
+    if not n or not _aligned(columns, n):
+        return ""
+    start = n - max_days if max_days and n > max_days else 0
+    if start:
+        index = index[-max_days:] if len(index) >= max_days else index[-(n - start):]
+        n -= start
+    # zip() below stops after n rows, so a long enough index is used as is; a short one is padded
+    dates = index if len(index) >= n else index + [""] * (n - len(index))
+    # Price columns as one float matrix (None -> NaN, restored afterwards so it still prints as None):
+    # EUR conversion and rounding are vector ops instead of four float()/round() calls per row
+    missing = [None] * n
+    raw = [columns[k][start:] if k in columns else missing for k in _PRICE_KEYS]
+    prices = np.array(raw, dtype=np.float64)
+    if to_eur and eur_rate and eur_rate > 0:
+        prices /= eur_rate
+    np.round(prices, 4, out=prices)
+    price_text = prices.tolist()
+    for col_raw, col in zip(raw, price_text):
+        if None in col_raw:
+            col[:] = [v if r is not None else None for v, r in zip(col, col_raw)]
+    volumes = columns["Volume"][start:] if "Volume" in columns else [0] * n
+    # Header and rows go into a single join (no row list joined and then prefixed with the header);
+    # map() over the bound %-formatter keeps the per-row loop in C (%s prints values like the f-string did)
+    rows = map(_OHLCV_ROW, zip(dates, *price_text, volumes))
+    return "\n".join(chain((OHLCV_CSV_HEADER,), rows))
+
+
+def _finite_array(values: list) -> np.ndarray:
+    """float64 array of values; NaN for missing, non-numeric or non-finite entries."""
+    try:
+        arr = np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        arr = np.empty(len(values), dtype=np.float64)
+        for i, x in enumerate(values):
+            try:
+                arr[i] = float(x)
+            except (TypeError, ValueError):
+                arr[i] = np.nan
+    arr[~np.isfinite(arr)] = np.nan
+    return arr
 
 
 def derive_trend_and_volume_from_ohlcv(hist_dict: dict) -> Dict:
@@ -108,137 +120,133 @@ def derive_trend_and_volume_from_ohlcv(hist_dict: dict) -> Dict:
     out = {}
     if not hist_dict or "data" not in hist_dict:
         return out
-    data = list(hist_dict["data"])
-    if not data:
+    columns = hist_columns(hist_dict)
+    n = len(next(iter(columns.values()), ()))
+    if not n:
+        return out
+
+    def _column(name: str) -> np.ndarray:
+        return _finite_array(columns.get(name) or columns.get(name.lower()) or [None] * n)
+
+    if not _aligned(columns, n):
+        logger.debug("derive_trend_and_volume skipped: OHLCV columns differ in length")
         return out
-    n = len(data)
+    # One array per field; NaN marks missing/non-finite values so they don't pollute aggregates.
+    # Rows without a close are skipped; other missing prices fall back to the close.
     try:
-        closes = []
-        opens = []
-        highs = []
-        lows = []
-        vols = []
-        for rec in data:
-            raw_c = rec.get("Close") or rec.get("close")
-            raw_o = rec.get("Open") or rec.get("open")
-            raw_h = rec.get("High") or rec.get("high")
-            raw_l = rec.get("Low") or rec.get("low")
-            raw_v = rec.get("Volume") or rec.get("volume") or 0
-
-            # Treat NaN / non-finite values as missing so they don't pollute aggregates
-            def _finite_or_none(x):
-                try:
-                    v = float(x)
-                except (TypeError, ValueError):
-                    return None
-                return v if math.isfinite(v) else None
-
-            c = _finite_or_none(raw_c)
-            o = _finite_or_none(raw_o)
-            h = _finite_or_none(raw_h)
-            l_ = _finite_or_none(raw_l)
-            v = _finite_or_none(raw_v)
-
-            if c is not None:
-                closes.append(c)
-                opens.append(o if o is not None else c)
-                highs.append(h if h is not None else c)
-                lows.append(l_ if l_ is not None else c)
-                vols.append(v if v is not None else 0.0)
-            else:
-                closes.append(None)
-                opens.append(None)
-                highs.append(None)
-                lows.append(None)
-                vols.append(None)
-        # drop None closes for SMA; use last valid
-        valid_closes = [c for c in closes if c is not None]
-        if not valid_closes:
+        closes = _column("Close")
+        has_close = ~np.isnan(closes)
+        valid_closes = closes[has_close]
+        if not len(valid_closes):
             return out
-        out["current_price"] = valid_closes[-1]
+        opens = np.where(np.isnan(o := _column("Open")), closes, o)
+        highs = np.where(np.isnan(h := _column("High")), closes, h)
+        lows = np.where(np.isnan(l_ := _column("Low")), closes, l_)
+        vols = _column("Volume")
+        valid_vols = vols[has_close & (vols > 0)]
+
+        out["current_price"] = float(valid_closes[-1])
         # Breakout volume vs average: last 5d vol / 20d avg
-        valid_vols = [v for v in vols if v is not None and v > 0]
         if len(valid_vols) >= 20:
-            avg_20 = sum(valid_vols[-20:]) / 20
-            last_5_vol = sum(valid_vols[-5:]) / 5 if len(valid_vols) >= 5 else avg_20
+            avg_20 = float(valid_vols[-20:].mean())
+            last_5_vol = float(valid_vols[-5:].mean())
             if avg_20 > 0:
                 out["breakout_volume_vs_avg"] = round(last_5_vol / avg_20, 2)
         # Accumulation days (last ~4 weeks = 20 trading days): up days (close > open)
-        if len(closes) >= 20 and len(opens) >= 20:
-            start = len(closes) - 20
-            up_days = sum(1 for i in range(start, len(closes)) if closes[i] is not None and opens[i] is not None and closes[i] > opens[i])
-            out["accumulation_days_4w"] = up_days
+        if n >= 20:
+            out["accumulation_days_4w"] = int(np.count_nonzero(closes[-20:] > opens[-20:]))
         # 52w high/low (last 252 or all) – ignore missing/non-finite values
         window_52 = min(252, n)
-        recent_highs = [h for h in highs[-window_52:] if h is not None]
-        recent_lows = [l for l in lows[-window_52:] if l is not None]
-        if recent_highs:
-            out["52_week_high"] = round(max(recent_highs), 2)
-        if recent_lows:
-            out["52_week_low"] = round(min(recent_lows), 2)
+        recent = has_close[-window_52:]
+        if recent.any():
+            out["52_week_high"] = round(float(highs[-window_52:][recent].max()), 2)
+            out["52_week_low"] = round(float(lows[-window_52:][recent].min()), 2)
         # SMAs (last 50/150/200 closes)
         for period, key in [(50, "sma_50"), (150, "sma_150"), (200, "sma_200")]:
             if len(valid_closes) >= period:
-                out[key] = round(sum(valid_closes[-period:]) / period, 2)
+                out[key] = round(float(valid_closes[-period:].mean()), 2)
         # Returns
         if len(valid_closes) >= 126:  # 6M
-            out["return_6m_pct"] = round((valid_closes[-1] / valid_closes[-126] - 1) * 100, 2)
+            out["return_6m_pct"] = round(float(valid_closes[-1] / valid_closes[-126] - 1) * 100, 2)
         if len(valid_closes) >= 252:  # 12M
-            out["return_12m_pct"] = round((valid_closes[-1] / valid_closes[-252] - 1) * 100, 2)
+            out["return_12m_pct"] = round(float(valid_closes[-1] / valid_closes[-252] - 1) * 100, 2)
         # Avg daily volume (last 20)
-        valid_vols = [v for v in vols if v is not None and v > 0]
-        if valid_vols:
-            window = valid_vols[-20:] if len(valid_vols) >= 20 else valid_vols
-            out["avg_daily_volume"] = round(sum(window) / len(window), 0)
+        if len(valid_vols):
+            out["avg_daily_volume"] = round(float(valid_vols[-20:].mean()), 0)
     except (TypeError, ValueError, IndexError) as e:
         logger.debug("derive_trend_and_volume failed: %s", e)
     return out
 
 
-def resolve_cache_entry(ticker: str, stocks: Dict) -> Optional[Dict]:
+def resolve_cache_entry(ticker: str, stocks: Dict, index: Optional[TickerIndex] = None) -> Optional[Dict]:
     t = (ticker or "").strip().upper()
     if t in stocks:
         return stocks[t]
     cleaned = clean_ticker(t) or t
     if cleaned in stocks:
         return stocks[cleaned]
-    for key in stocks:
-        if key.upper() == t or (clean_ticker(key) or key) == cleaned:
-            return stocks[key]
-    return None
+    return lookup_ticker_index(index if index is not None else build_ticker_index(stocks), t, cleaned)
 
 
 def build_t212_to_yahoo_map(watchlist_path: str = "watchlist.csv") -> Dict[str, str]:
     """Build Trading212 symbol -> Yahoo symbol from watchlist (cache is keyed by Yahoo)."""
-    rows = load_watchlist(watchlist_path)
-    out: Dict[str, str] = {}
-    for r in rows:
-        t212 = (r.get(TRADING212_SYMBOL) or "").strip().upper()
-        yahoo = (r.get(YAHOO_SYMBOL) or "").strip().upper()
-        if t212 and yahoo:
-            out[t212] = yahoo
-    return out
+    # load_watchlist rows are already stripped/uppercased and always carry a yahoo_symbol
+    return {r[TRADING212_SYMBOL]: r[YAHOO_SYMBOL] for r in load_watchlist(watchlist_path) if r[TRADING212_SYMBOL]}
+
+
+def prepared_files_fresh(watchlist_path: str, pretty: bool) -> bool:
+    """
+    Both prepared files were written today (the EUR/USD rate in them is per day) by a run with the same
+    watchlist and --pretty setting (recorded in meta), and are newer than every input of this step, so a
+    rebuild would produce the same files. A missing scan or cache is never fresh (the run reports it).
+    """
+    outputs = (PREPARED_EXISTING_V2, PREPARED_NEW_V2)
+    if not all(p.exists() and date.fromtimestamp(p.stat().st_mtime) == date.today() for p in outputs):
+        return False
+    if not (SCAN_RESULTS_V2_LATEST.exists() and NEW_PIPELINE_CACHE.exists()):
+        return False
+    inputs = (SCAN_RESULTS_V2_LATEST, NEW_PIPELINE_CACHE, NEW_PIPELINE_POSITIONS, PREPARED_FOR_MINERVINI, Path(watchlist_path))
+    if not outputs_up_to_date(outputs, inputs):
+        return False
+    try:
+        meta = read_json(PREPARED_EXISTING_V2).get("meta") or {}
+    except Exception:
+        return False
+    return meta.get("watchlist") == str(Path(watchlist_path).resolve()) and meta.get("pretty") == pretty
 
 
 def main():
     parser = argparse.ArgumentParser(description="05 V2: Prepare ChatGPT data from V2 scan")
     parser.add_argument("--watchlist", default="watchlist.csv", help="Watchlist CSV (same as 01/03)")
+    parser.add_argument("--pretty", action="store_true", help="Indent the prepared JSON files (default compact: smaller, faster to write)")
+    parser.add_argument("--force", action="store_true", help="Rebuild even when the prepared files are newer than all inputs")
     args = parser.parse_args()
 
     print("\n" + "=" * 80)
     print("05 V2: PREPARE CHATGPT DATA (from V2 scan)")
     print("=" * 80)
 
+    if not args.force and prepared_files_fresh(args.watchlist, args.pretty):
+        print("Prepared files are up to date (newer than scan, cache, positions and watchlist); skipping. Use --force to rebuild.")
+        print("=" * 80 + "\n")
+        return
+
     scan_results = load_scan_results_v2()
     if not scan_results:
         print("No V2 scan results. Run 04_generate_full_report_v2.py first.")
         return
 
-    cached_data = load_cache()
+    cached_data = load_pipeline_cache()
     stocks = cached_data.get("stocks", {})
-    positions = load_positions()
-    eur_usd_rate, eur_usd_rate_date = get_eur_usd_rate_with_date()
-    t212_to_yahoo = build_t212_to_yahoo_map(args.watchlist)
+    cache_index = build_ticker_index(stocks)
+    positions = load_pipeline_positions()
+    # The rate only converts EUR positions and the watchlist map only resolves position symbols:
+    # skip the rate fetch and the CSV parse when there is nothing to use them for
+    if any((pos.get("currency") or "USD").upper() == "EUR" for pos in positions):
+        eur_usd_rate, eur_usd_rate_date = get_eur_usd_rate_with_date_cached()
+    else:
+        eur_usd_rate, eur_usd_rate_date = None, None
+    t212_to_yahoo = build_t212_to_yahoo_map(args.watchlist) if positions else {}
 
     V2_REPORTS.mkdir(parents=True, exist_ok=True)
 
@@ -248,34 +256,34 @@ def main():
     for pos in positions:
         ticker = pos.get("ticker") or pos.get("ticker_raw") or ""
         cache_key = t212_to_yahoo.get(ticker.upper()) or ticker
-        cached = resolve_cache_entry(cache_key, stocks)
+        cached = resolve_cache_entry(cache_key, stocks, cache_index)
         hist = cached.get("historical_data", {}) if cached else {}
-        to_eur = (pos.get("currency") or "USD").upper() == "EUR" and eur_usd_rate and eur_usd_rate > 0
-        ohlcv_lines = ohlcv_to_csv_rows(hist, to_eur=to_eur, eur_rate=eur_usd_rate)
-        ohlcv_csv = "Date, Open, High, Low, Close, Volume\n" + "\n".join(ohlcv_lines) if ohlcv_lines else NO_OHLCV
+        currency = (pos.get("currency") or "USD").upper()
+        to_eur = currency == "EUR" and eur_usd_rate and eur_usd_rate > 0
+        ohlcv_csv = ohlcv_to_csv(hist, to_eur=to_eur, eur_rate=eur_usd_rate) or NO_OHLCV
         prepared_existing.append({
             "ticker": ticker,
             "entry": float(pos.get("entry") or 0),
             "current": float(pos["current"]) if pos.get("current") is not None else None,
             "quantity": float(pos.get("quantity") or 0),
-            "currency": (pos.get("currency") or "USD").upper(),
+            "currency": currency,
             "name": pos.get("name") or ticker,
             "ohlcv_csv": ohlcv_csv,
         })
 
     # --- New positions: A+/A from V2 scan, include full V2 structured row for LLM ---
-    a_plus_a = [r for r in scan_results if r.get("eligible") and r.get("grade") in ("A+", "A") and "error" not in str(r)]
+    a_plus_a = (r for r in scan_results if r.get("eligible") and r.get("grade") in ("A+", "A") and "error" not in r)
     prepared_new = []
     for r in a_plus_a:
         ticker = (r.get("ticker") or "").strip().upper()
         if not ticker:
             continue
-        cached = resolve_cache_entry(ticker, stocks)
+        cached = resolve_cache_entry(ticker, stocks, cache_index)
         if not cached or not cached.get("data_available"):
             continue
         hist = cached.get("historical_data", {})
-        ohlcv_lines = ohlcv_to_csv_rows(hist, to_eur=False)
-        if not ohlcv_lines:
+        ohlcv_csv = ohlcv_to_csv(hist, to_eur=False)
+        if not ohlcv_csv:
             continue
         # Derive trend/52w/returns/volume from OHLCV for 08 prompt (independent analysis)
         derived = derive_trend_and_volume_from_ohlcv(hist)
@@ -301,15 +309,14 @@ def main():
             "volume_score": r.get("volume_score"),
             "breakout_score": r.get("breakout_score"),
             "power_rank": r.get("power_rank"),
-            "ohlcv_csv": "Date, Open, High, Low, Close, Volume\n" + "\n".join(ohlcv_lines),
+            "ohlcv_csv": ohlcv_csv,
             **derived,
         })
 
     data_timestamp_yahoo = None
     if PREPARED_FOR_MINERVINI.exists():
         try:
-            with open(PREPARED_FOR_MINERVINI, "r", encoding="utf-8") as f:
-                prep = json.load(f)
+            prep = read_json(PREPARED_FOR_MINERVINI)
             data_timestamp_yahoo = (prep.get("metadata") or {}).get("data_timestamp_yahoo")
         except Exception:
             pass
@@ -319,13 +326,16 @@ def main():
         "data_timestamp_yahoo": data_timestamp_yahoo,
         "eur_usd_rate": eur_usd_rate,
         "eur_usd_rate_date": eur_usd_rate_date,
+        # Run settings, so the freshness check only skips reruns that would write the same files
+        "watchlist": str(Path(args.watchlist).resolve()),
+        "pretty": args.pretty,
     }
-    with open(PREPARED_EXISTING_V2, "w", encoding="utf-8") as f:
-        json.dump({"meta": meta, "positions": prepared_existing}, f, indent=2, default=str)
+    write_bytes_atomic(
+        PREPARED_EXISTING_V2, dumps_json({"meta": meta, "positions": prepared_existing}, indent=args.pretty, default=str)
+    )
     print(f"Wrote {PREPARED_EXISTING_V2} ({len(prepared_existing)} positions)")
 
-    with open(PREPARED_NEW_V2, "w", encoding="utf-8") as f:
-        json.dump({"meta": meta, "stocks": prepared_new}, f, indent=2, default=str)
+    write_bytes_atomic(PREPARED_NEW_V2, dumps_json({"meta": meta, "stocks": prepared_new}, indent=args.pretty, default=str))
     print(f"Wrote {PREPARED_NEW_V2} ({len(prepared_new)} A+/A stocks from V2)")
 
     print("=" * 80 + "\n")
@@ -6,16 +6,15 @@ with V2 scan data (composite_score, grade, base type, pivot) when the ticker was
 Output: institutional review and a clear suggestion per stock (HOLD / ADD / TRIM / EXIT).
 Writes reportsV2/chatgpt_existing_positions_v2_<ts>.txt
 """
-import json
 import re
 import argparse
-from pathlib import Path
+from dataclasses import dataclass
 from datetime import datetime
 from typing import List, Dict, Optional, Tuple
 
-from dotenv import load_dotenv
+from file_utils import read_json, read_json_cached, write_lines_atomic
 from logger_config import setup_logging, get_logger
-from openai_utils import require_openai_api_key, send_to_chatgpt as openai_send
+from openai_utils import clear_response_cache, require_openai_api_key, send_to_chatgpt as openai_send, send_batch, send_many, set_rate_limits
 from config import (
     DEFAULT_ENV_PATH,
     OPENAI_CHATGPT_MODEL,
@@ -24,9 +23,6 @@ from config import (
     SCAN_RESULTS_V2_LATEST,
 )
 
-if Path(DEFAULT_ENV_PATH).exists():
-    load_dotenv(Path(DEFAULT_ENV_PATH))
-
 V2_REPORTS = REPORTS_DIR_V2  # reportsV2
 PREPARED_EXISTING_V2 = V2_REPORTS / "prepared_existing_positions_v2.json"
 
@@ -34,6 +30,13 @@ setup_logging(log_level="INFO", log_to_file=True)
 logger = get_logger(__name__)
 
 
+def _load_env() -> None:
+    """Load .env (OPENAI_API_KEY) only when the script actually runs."""
+    if DEFAULT_ENV_PATH.exists():
+        from dotenv import load_dotenv
+        load_dotenv(DEFAULT_ENV_PATH)
+
+
 def _fmt(x, round_to=None):
     if x is None or x == "":
         return "—"
@@ -44,39 +47,78 @@ def _fmt(x, round_to=None):
         return str(x)
 
 
+@dataclass(slots=True, frozen=True)
+class Position:
+    """One entry of prepared_existing_positions_v2.json, read from its dict once (defaults as written by 05)."""
+    ticker: str
+    name: str
+    entry: float
+    current: Optional[float]
+    quantity: float
+    currency: str
+    ohlcv_csv: str
+
+    @classmethod
+    def from_json(cls, d: Dict) -> "Position":
+        ticker = d.get("ticker", "?")
+        return cls(
+            ticker=ticker,
+            name=d.get("name", ticker),
+            entry=d.get("entry", 0),
+            current=d.get("current"),
+            quantity=d.get("quantity", 0),
+            currency=d.get("currency", "USD"),
+            ohlcv_csv=(d.get("ohlcv_csv") or "").strip(),
+        )
+
+
 def load_v2_scan_by_ticker() -> Dict[str, Dict]:
     """Load V2 scan results and index by ticker (uppercase)."""
     if not SCAN_RESULTS_V2_LATEST.exists():
         return {}
     try:
-        with open(SCAN_RESULTS_V2_LATEST, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        data = read_json_cached(SCAN_RESULTS_V2_LATEST)
         rows = data if isinstance(data, list) else []
-        return {(str(r.get("ticker") or "").strip().upper()): r for r in rows if r.get("ticker")}
+        # Key normalized once per row; rows whose ticker is blank after stripping are skipped
+        return {t: r for r in rows if (t := str(r.get("ticker") or "").strip().upper())}
     except Exception as e:
         logger.warning("Could not load V2 scan for enrichment: %s", e)
         return {}
 
 
+# V2 scan context section of the prompt, filled in one format() call per position
+_V2_CONTEXT_TEMPLATE = (
+    "V2 SCAN CONTEXT (this ticker was in the latest V2 scan):\n"
+    "- Grade: {grade}\n"
+    "- Composite Score: {composite_score}\n"
+    "- Base Type: {base_type}\n"
+    "- Base Length (weeks): {base_length}\n"
+    "- Base Depth %: {base_depth}\n"
+    "- Pivot Price: {pivot_price}\n"
+    "- Distance to Pivot %: {distance_to_pivot}\n"
+    "- RS Percentile: {rs_percentile}\n"
+    "- Stop (V2): {stop_price}"
+)
+
+
 def _build_v2_context_block(v2_row: Dict) -> str:
     """Build optional V2 scan context section for the prompt."""
     base = v2_row.get("base") or {}
     rs = v2_row.get("relative_strength") or {}
     br = v2_row.get("breakout") or {}
     risk = v2_row.get("risk") or {}
-    lines = [
-        "V2 SCAN CONTEXT (this ticker was in the latest V2 scan):",
-        f"- Grade: {v2_row.get('grade') or '—'}",
-        f"- Composite Score: {_fmt(v2_row.get('composite_score'), 1)}",
-        f"- Base Type: {base.get('type') or '—'}",
-        f"- Base Length (weeks): {_fmt(base.get('length_weeks'), 1)}",
-        f"- Base Depth %: {_fmt(base.get('depth_pct'), 1)}",
-        f"- Pivot Price: {_fmt(br.get('pivot_price'), 2)}",
-        f"- Distance to Pivot %: {(_fmt(br.get('distance_to_pivot_pct'), 2) + '%') if br.get('distance_to_pivot_pct') is not None else '—'}",
-        f"- RS Percentile: {_fmt(rs.get('rs_percentile'), 1)}",
-        f"- Stop (V2): {_fmt(risk.get('stop_price'), 2)}",
-    ]
-    return "\n".join(lines)
+    distance = br.get("distance_to_pivot_pct")
+    return _V2_CONTEXT_TEMPLATE.format(
+        grade=v2_row.get("grade") or "—",
+        composite_score=_fmt(v2_row.get("composite_score"), 1),
+        base_type=base.get("type") or "—",
+        base_length=_fmt(base.get("length_weeks"), 1),
+        base_depth=_fmt(base.get("depth_pct"), 1),
+        pivot_price=_fmt(br.get("pivot_price"), 2),
+        distance_to_pivot=_fmt(distance, 2) + "%" if distance is not None else "—",
+        rs_percentile=_fmt(rs.get("rs_percentile"), 1),
+        stop_price=_fmt(risk.get("stop_price"), 2),
+    )
 
 
 PROMPT_TEMPLATE = """Act as a professional institutional technical analyst using Mark Minervini, Stan Weinstein, and quantitative price/volume analysis.
@@ -162,6 +204,12 @@ Follow with one short sentence explaining why. Suggest stop and add levels if ap
 
 NO_OHLCV_PLACEHOLDER = "No OHLCV data available for this ticker."
 
+# RECOMMENDATION: X plus the rest of its line (compiled once, used for every response)
+_RECOMMENDATION_RE = re.compile(
+    r"RECOMMENDATION\s*:\s*(HOLD|ADD|TRIM|EXIT)\s*[.—\-]*\s*(.*?)(?=\n|$)",
+    re.IGNORECASE | re.DOTALL,
+)
+
 
 def _parse_recommendation(content: str) -> Tuple[str, str]:
     """
@@ -171,14 +219,11 @@ def _parse_recommendation(content: str) -> Tuple[str, str]:
     if not content or not content.strip():
         return ("", "")
     # Find last occurrence of RECOMMENDATION: X (in case model repeats)
-    pattern = re.compile(
-        r"RECOMMENDATION\s*:\s*(HOLD|ADD|TRIM|EXIT)\s*[.—\-]*\s*(.*?)(?=\n|$)",
-        re.IGNORECASE | re.DOTALL,
-    )
-    matches = list(pattern.finditer(content))
-    if not matches:
+    m = None
+    for m in _RECOMMENDATION_RE.finditer(content):
+        pass
+    if m is None:
         return ("", "")
-    m = matches[-1]
     action = (m.group(1) or "").strip().upper()
     rationale = (m.group(2) or "").strip()
     # Take first sentence or first 200 chars
@@ -188,6 +233,11 @@ def _parse_recommendation(content: str) -> Tuple[str, str]:
     return (action, rationale)
 
 
+def _echo(text: str) -> None:
+    """Streamed response chunk to the console (06 --stream)."""
+    print(text, end="", flush=True)
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="06 V2: ChatGPT analysis for existing positions (Trading212 + OHLCV, optional V2 scan context)"
@@ -195,16 +245,34 @@ def main():
     parser.add_argument("--model", default=None, help="OpenAI model")
     parser.add_argument("--api-key", default=None, help="OpenAI API key")
     parser.add_argument("--limit", type=int, default=100, help="Max positions to analyze (default 100)")
+    parser.add_argument("--no-cache", action="store_true", help="Always call the API (ignore saved responses for identical prompts)")
+    parser.add_argument("--cache-ttl", type=float, default=None, help="Max age in hours of a reused response (default OPENAI_CHATGPT_CACHE_TTL_HOURS; 0 = no expiry)")
+    parser.add_argument("--cache-clear", action="store_true", help="Delete all saved ChatGPT responses before running")
+    parser.add_argument("--stream", action="store_true", help="Print each analysis to the console as it is generated (ignored with --batch)")
+    parser.add_argument(
+        "--concurrency", type=int, default=None,
+        help="Parallel ChatGPT requests (default OPENAI_CHATGPT_CONCURRENCY in config; ignored with --stream/--batch)",
+    )
+    parser.add_argument("--rpm", type=int, default=None, help="OpenAI requests per minute to pace to (default OPENAI_CHATGPT_RPM; 0 = unlimited)")
+    parser.add_argument("--tpm", type=int, default=None, help="OpenAI tokens per minute to pace to (default OPENAI_CHATGPT_TPM; 0 = unlimited)")
+    parser.add_argument(
+        "--batch", action="store_true",
+        help="Send the position analyses as one OpenAI Batch API job (about half the cost; waits until the job finishes, up to 24h)",
+    )
     args = parser.parse_args()
 
+    _load_env()
+    if args.cache_clear:
+        print(f"Cleared {clear_response_cache()} saved ChatGPT responses")
+    if args.rpm is not None or args.tpm is not None:
+        set_rate_limits(args.rpm, args.tpm)
     api_key = require_openai_api_key(args.api_key)
     if not PREPARED_EXISTING_V2.exists():
         print(f"[ERROR] {PREPARED_EXISTING_V2} not found. Run 02_fetch_positions_trading212_V2.py then 05_prepare_chatgpt_data_v2.py.")
         return
 
-    with open(PREPARED_EXISTING_V2, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    positions = data.get("positions", [])[: args.limit]
+    data = read_json(PREPARED_EXISTING_V2)
+    positions = [Position.from_json(d) for d in data.get("positions", [])[: args.limit]]
     if not positions:
         print("No positions in prepared data. Run 02 (Trading212) then 05 V2.")
         return
@@ -212,6 +280,7 @@ def main():
     v2_by_ticker = load_v2_scan_by_ticker()
     model = args.model or OPENAI_CHATGPT_MODEL
     max_tokens = min(OPENAI_CHATGPT_MAX_COMPLETION_TOKENS, 8000)
+    use_cache = False if args.no_cache else None
 
     print(f"\n{'='*80}")
     print("06 V2: CHATGPT EXISTING POSITIONS (Trading212 + V2 context)")
@@ -219,56 +288,75 @@ def main():
     print(f"Positions: {len(positions)}  Model: {model}")
     print(f"{'='*80}\n")
 
-    results: List[Tuple[Dict, Optional[str], str, str]] = []  # (pos, content, action, rationale)
-
-    for i, pos in enumerate(positions, 1):
-        ticker = pos.get("ticker", "?")
-        name = pos.get("name", ticker)
-        entry = pos.get("entry", 0)
-        current = pos.get("current")
-        current_str = f"{current:.2f}" if current is not None else "N/A"
-        quantity = pos.get("quantity", 0)
-        currency = pos.get("currency", "USD")
-        position_size = f"{quantity} shares" if quantity else "N/A"
-        ohlcv = (pos.get("ohlcv_csv") or "").strip()
+    prompts: List[str] = []
+    for pos in positions:
+        ticker = pos.ticker
+        current_str = f"{pos.current:.2f}" if pos.current is not None else "N/A"
+        position_size = f"{pos.quantity} shares" if pos.quantity else "N/A"
+        ohlcv = pos.ohlcv_csv
 
-        v2_row = v2_by_ticker.get((ticker or "").strip().upper()) if ticker else None
+        v2_row = v2_by_ticker.get(ticker.strip().upper()) if ticker else None
         v2_context = _build_v2_context_block(v2_row) if v2_row else "V2 scan context: not available (ticker not in latest scan or scan not run)."
 
         if not ohlcv or ohlcv == NO_OHLCV_PLACEHOLDER:
             prompt_text = PROMPT_NO_OHLCV.format(
                 ticker=ticker,
-                name=name,
-                entry_price=entry,
+                name=pos.name,
+                entry_price=pos.entry,
                 current_price=current_str,
                 position_size=position_size,
-                currency=currency,
+                currency=pos.currency,
                 v2_context=v2_context,
             )
         else:
             prompt_text = PROMPT_TEMPLATE.format(
                 ticker=ticker,
-                name=name,
-                entry_price=entry,
+                name=pos.name,
+                entry_price=pos.entry,
                 current_price=current_str,
                 position_size=position_size,
-                currency=currency,
+                currency=pos.currency,
                 v2_context=v2_context,
                 ohlcv_csv=ohlcv,
             )
+        prompts.append(prompt_text)
+
+    total = len(positions)
+    # (pos, content, action, rationale) per position, in position order
+    results: List[Tuple[Position, Optional[str], str, str]] = [(pos, None, "", "") for pos in positions]
+    done = [0]
 
-        print(f"[{i}/{len(positions)}] {ticker} ... ", end="", flush=True)
-        content, _ = openai_send(prompt_text, api_key, model=model, max_tokens=max_tokens)
+    def _record(idx: int, result) -> None:
+        done[0] += 1
+        content = result[0]
         action, rationale = _parse_recommendation(content) if content else ("", "")
-        if not content:
-            print("FAILED")
-            results.append((pos, None, "", ""))
-            continue
-        print(f"OK -> {action or '-'}")
-        results.append((pos, content, action, rationale))
-
-    # Report
-    report_ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        if content:
+            results[idx] = (positions[idx], content, action, rationale)
+        status = f"OK -> {action or '-'}" if content else "FAILED"
+        if args.stream:
+            print(status)
+        else:
+            print(f"[{done[0]}/{total}] {positions[idx].ticker} ... {status}", flush=True)
+
+    send_kwargs = dict(model=model, max_tokens=max_tokens, use_cache=use_cache, cache_ttl_hours=args.cache_ttl)
+    if args.batch:
+        print(f"Submitting {total} analyses as an OpenAI batch job (polling until it completes)...", flush=True)
+        for i, result in enumerate(send_batch(prompts, api_key, **send_kwargs)):
+            _record(i, result)
+    elif args.stream:
+        # Streamed text is readable only one response at a time, so --stream runs sequentially
+        for i, prompt_text in enumerate(prompts):
+            print(f"[{i + 1}/{total}] {positions[i].ticker} ... ", flush=True)
+            result = openai_send(prompt_text, api_key, on_delta=_echo, **send_kwargs)
+            print()
+            _record(i, result)
+    else:
+        # Positions are independent: send them concurrently, results stay in position order
+        send_many(prompts, api_key, max_workers=args.concurrency, on_done=_record, **send_kwargs)
+
+    # Report (one clock read for the header and the output filename)
+    now = datetime.now()
+    report_ts = now.strftime("%Y-%m-%d %H:%M:%S")
     report_lines = [
         "=" * 80,
         "06 V2: CHATGPT EXISTING POSITION SUGGESTIONS",
@@ -287,7 +375,7 @@ def main():
     report_lines.append("| Ticker | Suggestion | Rationale |")
     report_lines.append("|--------|------------|-----------|")
     for pos, _, action, rationale in results:
-        ticker = pos.get("ticker", "?")
+        ticker = pos.ticker
         action_display = action or "—"
         rationale_display = (rationale or "").replace("|", "\\|")[:120]
         report_lines.append(f"| {ticker} | {action_display} | {rationale_display} |")
@@ -298,9 +386,7 @@ def main():
     report_lines.append("")
 
     for pos, content, action, _ in results:
-        ticker = pos.get("ticker", "?")
-        name = pos.get("name", ticker)
-        report_lines.append(f"### {ticker} ({name}) — Suggestion: {action or '—'}")
+        report_lines.append(f"### {pos.ticker} ({pos.name}) — Suggestion: {action or '—'}")
         report_lines.append("")
         if content:
             report_lines.append(content.strip())
@@ -311,10 +397,10 @@ def main():
         report_lines.append("")
 
     V2_REPORTS.mkdir(parents=True, exist_ok=True)
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+    ts = now.strftime("%Y%m%d_%H%M%S")
     out_file = V2_REPORTS / f"chatgpt_existing_positions_v2_{ts}.txt"
-    out_file.write_text("\n".join(report_lines), encoding="utf-8")
-    print(f"Report saved: {out_file}\n")
+    size_bytes = write_lines_atomic(out_file, report_lines)
+    print(f"Report saved: {out_file} ({size_bytes / 1024:.1f} KB)\n")
 
 
 if __name__ == "__main__":
@@ -8,13 +8,12 @@ import json
 import re
 import math
 import argparse
-from pathlib import Path
 from datetime import datetime
-from typing import List, Dict
+from typing import Dict, List, Optional
 
-from dotenv import load_dotenv
+from file_utils import PartialLinesWriter, read_json
 from logger_config import setup_logging, get_logger
-from openai_utils import require_openai_api_key, send_to_chatgpt as openai_send
+from openai_utils import clear_response_cache, require_openai_api_key, send_to_chatgpt as openai_send, send_batch, send_many, set_rate_limits
 from config import (
     DEFAULT_ENV_PATH,
     OPENAI_CHATGPT_MODEL,
@@ -25,15 +24,19 @@ from config import (
     BREAKOUT_SCORE_TIGHT_HIGH_PCT,
 )
 
-if Path(DEFAULT_ENV_PATH).exists():
-    load_dotenv(Path(DEFAULT_ENV_PATH))
-
 V2_REPORTS = REPORTS_DIR_V2  # reportsV2
 PREPARED_NEW_V2 = V2_REPORTS / "prepared_new_positions_v2.json"
 
 setup_logging(log_level="INFO", log_to_file=True)
 logger = get_logger(__name__)
 
+
+def _load_env() -> None:
+    """Load .env (OPENAI_API_KEY) only when the script actually runs."""
+    if DEFAULT_ENV_PATH.exists():
+        from dotenv import load_dotenv
+        load_dotenv(DEFAULT_ENV_PATH)
+
 ORDER_PROMPT_V2 = """You are a technical analyst. Below are candidate stocks from a Minervini SEPA V2 scan (composite score, base type, RS percentile, distance to pivot).
 
 Rank them in the order you recommend for considering new entries: best opportunity first. One ticker per line. Reply with nothing else than the list of tickers.
@@ -74,13 +77,21 @@ def _infer_exchange(ticker: str) -> str:
     return "US"
 
 
-def _build_stock_data_section(s: Dict) -> str:
-    """Build STOCK DATA section from payload; use — when not available from prior scripts."""
-    ticker = s.get("ticker") or "—"
-    base = s.get("base") or {}
-    rs = s.get("relative_strength") or {}
-    br = s.get("breakout") or {}
-    # Current price: from derived or from pivot + distance
+def _fmt_pct(x, round_to=None):
+    """_fmt with a trailing % sign; — when the value is missing."""
+    return _fmt(x, round_to) + "%" if x is not None else "—"
+
+
+_MARKET_CONTEXT_SECTION = (
+    "Market Context:\n"
+    "- Index Trend (e.g., S&P 500 / DAX): —\n"
+    "- Sector Trend: —\n"
+    "- Stock vs Sector performance: —"
+)
+
+
+def _current_price(s: Dict, br: Dict):
+    """Current price: from derived or from pivot + distance."""
     current = s.get("current_price")
     if current is None and br.get("pivot_price") is not None and br.get("distance_to_pivot_pct") is not None:
         try:
@@ -89,41 +100,102 @@ def _build_stock_data_section(s: Dict) -> str:
             current = round(p * (1 + d), 2)
         except (TypeError, ValueError):
             pass
-    lines = [
+    return current
+
+
+def _build_stock_data_section(s: Dict) -> str:
+    """Build STOCK DATA section from payload; use — when not available from prior scripts."""
+    ticker = s.get("ticker") or "—"
+    base = s.get("base") or {}
+    rs = s.get("relative_strength") or {}
+    br = s.get("breakout") or {}
+    current = _current_price(s, br)
+    # One string per section; each field is looked up once
+    trend_section = (
+        "Trend:\n"
+        f"- Current Price: {_fmt(current, 2)}\n"
+        f"- 50 MA: {_fmt(s.get('sma_50'), 2)}\n"
+        f"- 150 MA: {_fmt(s.get('sma_150'), 2)}\n"
+        f"- 200 MA: {_fmt(s.get('sma_200'), 2)}\n"
+        f"- 52w High: {_fmt(s.get('52_week_high'), 2)}\n"
+        f"- 52w Low: {_fmt(s.get('52_week_low'), 2)}\n"
+        f"- Prior Run % (last major advance): {_fmt_pct(base.get('prior_run_pct'), 1)}\n"
+    )
+    base_section = (
+        "Base:\n"
+        f"- Base Type: {base.get('type') or '—'}\n"
+        f"- Base Length (weeks): {_fmt(base.get('length_weeks'), 1)}\n"
+        f"- Base Depth %: {_fmt(base.get('depth_pct'), 1)}\n"
+        f"- Pivot Price: {_fmt(br.get('pivot_price'), 2)}\n"
+        f"- Distance to Pivot %: {_fmt_pct(br.get('distance_to_pivot_pct'), 2)}\n"
+    )
+    momentum_section = (
+        "Momentum:\n"
+        f"- RSI (14): {_fmt(rs.get('rsi_14'), 1)}\n"
+        f"- 3M Return %: {_fmt_pct(rs.get('rs_3m'), 2)}\n"
+        f"- 6M Return %: {_fmt_pct(s.get('return_6m_pct'), 2)}\n"
+        f"- 12M Return %: {_fmt_pct(s.get('return_12m_pct'), 2)}\n"
+        f"- RS Percentile (vs universe): {_fmt(rs.get('rs_percentile'), 1)}\n"
+    )
+    volume_section = (
+        "Volume:\n"
+        f"- Avg Daily Volume: {_fmt(s.get('avg_daily_volume'), 0)}\n"
+        f"- Accumulation/Distribution Days (last 4 weeks): {_fmt(s.get('accumulation_days_4w'), 0)}\n"
+        f"- Breakout volume vs average (last 5d/20d avg): {_fmt(s.get('breakout_volume_vs_avg'), 2)}\n"
+    )
+    return "\n".join((
         "========================\nSTOCK DATA\n========================\n",
-        f"Ticker: {ticker}",
-        f"Market: {_infer_exchange(ticker)}",
-        "Timeframe: Daily\n",
-        "Trend:",
-        f"- Current Price: {_fmt(current, 2)}",
-        f"- 50 MA: {_fmt(s.get('sma_50'), 2)}",
-        f"- 150 MA: {_fmt(s.get('sma_150'), 2)}",
-        f"- 200 MA: {_fmt(s.get('sma_200'), 2)}",
-        f"- 52w High: {_fmt(s.get('52_week_high'), 2)}",
-        f"- 52w Low: {_fmt(s.get('52_week_low'), 2)}",
-        f"- Prior Run % (last major advance): {(_fmt(base.get('prior_run_pct'), 1) + '%') if base.get('prior_run_pct') is not None else '—'}\n",
-        "Base:",
-        f"- Base Type: {base.get('type') or '—'}",
-        f"- Base Length (weeks): {_fmt(base.get('length_weeks'), 1)}",
-        f"- Base Depth %: {_fmt(base.get('depth_pct'), 1)}",
-        f"- Pivot Price: {_fmt(br.get('pivot_price'), 2)}",
-        f"- Distance to Pivot %: {(_fmt(br.get('distance_to_pivot_pct'), 2) + '%') if br.get('distance_to_pivot_pct') is not None else '—'}\n",
-        "Momentum:",
-        f"- RSI (14): {_fmt(rs.get('rsi_14'), 1)}",
-        f"- 3M Return %: {(_fmt(rs.get('rs_3m'), 2) + '%') if rs.get('rs_3m') is not None else '—'}",
-        f"- 6M Return %: {(_fmt(s.get('return_6m_pct'), 2) + '%') if s.get('return_6m_pct') is not None else '—'}",
-        f"- 12M Return %: {(_fmt(s.get('return_12m_pct'), 2) + '%') if s.get('return_12m_pct') is not None else '—'}",
-        f"- RS Percentile (vs universe): {_fmt(rs.get('rs_percentile'), 1)}\n",
-        "Volume:",
-        f"- Avg Daily Volume: {_fmt(s.get('avg_daily_volume'), 0)}",
-        f"- Accumulation/Distribution Days (last 4 weeks): {_fmt(s.get('accumulation_days_4w'), 0) if s.get('accumulation_days_4w') is not None else '—'}",
-        f"- Breakout volume vs average (last 5d/20d avg): {_fmt(s.get('breakout_volume_vs_avg'), 2) if s.get('breakout_volume_vs_avg') is not None else '—'}\n",
-        "Market Context:",
-        "- Index Trend (e.g., S&P 500 / DAX): —",
-        "- Sector Trend: —",
-        "- Stock vs Sector performance: —",
-    ]
-    return "\n".join(lines)
+        f"Ticker: {ticker}\nMarket: {_infer_exchange(ticker)}\nTimeframe: Daily\n",
+        trend_section,
+        base_section,
+        momentum_section,
+        volume_section,
+        _MARKET_CONTEXT_SECTION,
+    ))
+
+
+def _num(x, round_to: int):
+    """Rounded float for the compact encoding; None if missing or non-numeric/non-finite."""
+    try:
+        v = float(x)
+    except (TypeError, ValueError):
+        return None
+    return round(v, round_to) if math.isfinite(v) else None
+
+
+def _build_stock_data_compact(s: Dict) -> str:
+    """STOCK DATA section as one line of JSON (same fields as _build_stock_data_section; null = not available)."""
+    ticker = s.get("ticker") or None
+    base = s.get("base") or {}
+    rs = s.get("relative_strength") or {}
+    br = s.get("breakout") or {}
+    data = {
+        "ticker": ticker,
+        "market": _infer_exchange(ticker).replace("—", "") or None,
+        "timeframe": "daily",
+        "price": _num(_current_price(s, br), 2),
+        "ma50": _num(s.get("sma_50"), 2),
+        "ma150": _num(s.get("sma_150"), 2),
+        "ma200": _num(s.get("sma_200"), 2),
+        "high_52w": _num(s.get("52_week_high"), 2),
+        "low_52w": _num(s.get("52_week_low"), 2),
+        "prior_run_pct": _num(base.get("prior_run_pct"), 1),
+        "base_type": base.get("type") or None,
+        "base_weeks": _num(base.get("length_weeks"), 1),
+        "base_depth_pct": _num(base.get("depth_pct"), 1),
+        "pivot": _num(br.get("pivot_price"), 2),
+        "to_pivot_pct": _num(br.get("distance_to_pivot_pct"), 2),
+        "rsi14": _num(rs.get("rsi_14"), 1),
+        "ret_3m_pct": _num(rs.get("rs_3m"), 2),
+        "ret_6m_pct": _num(s.get("return_6m_pct"), 2),
+        "ret_12m_pct": _num(s.get("return_12m_pct"), 2),
+        "rs_percentile": _num(rs.get("rs_percentile"), 1),
+        "avg_daily_volume": _num(s.get("avg_daily_volume"), 0),
+        "acc_dist_days_4w": _num(s.get("accumulation_days_4w"), 0),
+        "breakout_vol_5d_vs_20d": _num(s.get("breakout_volume_vs_avg"), 2),
+    }
+    # Market context fields (index/sector trend) are never available here, so they are left out
+    return "STOCK DATA (JSON, null = not available): " + json.dumps(data, ensure_ascii=False, separators=(",", ":"))
 
 
 INDEPENDENT_ANALYSIS_PROMPT = """You are an independent institutional momentum trader using a strict Minervini-style SEPA framework.
@@ -192,12 +264,15 @@ def _status_for_prompt(s: Dict) -> str:
     return "Watch"
 
 
+# Leading list numbering ("1." / "2)") and/or bullet ("-" / "*") on a ranked-ticker line
+_ORDER_LINE_PREFIX_RE = re.compile(r"^\s*(?:\d+[.)]\s*)?(?:[-*]\s*)?")
+
+
 def _parse_ticker_order(text: str, valid: set) -> List[str]:
     ordered = []
     seen = set()
     for line in text.strip().splitlines():
-        line = re.sub(r"^\s*\d+[.)]\s*", "", line.strip())
-        line = re.sub(r"^\s*[-*]\s*", "", line)
+        line = _ORDER_LINE_PREFIX_RE.sub("", line.strip(), count=1)
         for part in line.replace(",", " ").split():
             t = part.upper().strip(".:)")
             if 1 <= len(t) <= 12 and t not in seen and t in valid:
@@ -222,6 +297,22 @@ def _reorder(stocks: List[Dict], ordered: List[str]) -> List[Dict]:
     return result
 
 
+# ChatGPT grade in the comparison section, most specific first:
+# "My independent conclusion is **B**", "Mine: **A**", "**B+** / ...", "Quality grade ... **A**", ..., any "**B**"
+_GRADE_PATTERNS = tuple(
+    re.compile(p, re.IGNORECASE | re.DOTALL)
+    for p in (
+        r"My independent conclusion is\s*\*\*([A-D][+]?)\*\*",
+        r"Mine:\s*\*\*([A-D][+]?)\*\*",
+        r"\*\*([A-D][+]?)\*\*\s*/\s*",
+        r"Quality (?:grade|classification).*?\*\*([A-D][+]?)\*\*",
+        r"([A-D][+]?)\s*/\s*Not (?:buyable|ready)",
+        r"would you classify.*?\*\*([A-D][+]?)\*\*",
+        r"\*\*([A-D][+]?)\*\*",
+    )
+)
+
+
 def _parse_chatgpt_grade_from_response(content: str) -> str:
     """
     Extract ChatGPT's quality grade from the response (e.g. Comparison section).
@@ -238,18 +329,8 @@ def _parse_chatgpt_grade_from_response(content: str) -> str:
         comp_idx = 0
     # Search in the 800 chars after the comparison header
     block = content[comp_idx : comp_idx + 800]
-    # Common patterns: "**B**", "**A+**", "**B+**", "My conclusion is **B**", "grade: **A**"
-    # Prefer "My ... conclusion ... **Grade**" or "I would ... **Grade**" or "**Grade** /"
-    for pattern in [
-        r"My independent conclusion is\s*\*\*([A-D][+]?)\*\*",
-        r"Mine:\s*\*\*([A-D][+]?)\*\*",
-        r"\*\*([A-D][+]?)\*\*\s*/\s*",
-        r"Quality (?:grade|classification).*?\*\*([A-D][+]?)\*\*",
-        r"([A-D][+]?)\s*/\s*Not (?:buyable|ready)",
-        r"would you classify.*?\*\*([A-D][+]?)\*\*",
-        r"\*\*([A-D][+]?)\*\*",
-    ]:
-        m = re.search(pattern, block, re.IGNORECASE | re.DOTALL)
+    for pattern in _GRADE_PATTERNS:
+        m = pattern.search(block)
         if m:
             g = (m.group(1) or "").strip().upper().replace("*", "")
             if g and g[0] in ("A", "B", "C", "D") and (len(g) == 1 or g[1:] == "+"):
@@ -263,15 +344,36 @@ def main():
     parser.add_argument("--api-key", default=None, help="OpenAI API key")
     parser.add_argument("--limit", type=int, default=50, help="Max stocks to load for ranking")
     parser.add_argument("--max-rank", type=int, default=50, help="Run detailed ChatGPT analysis only for stocks up to this rank (default 50)")
+    parser.add_argument("--no-cache", action="store_true", help="Always call the API (ignore saved responses for identical prompts)")
+    parser.add_argument("--cache-ttl", type=float, default=None, help="Max age in hours of a reused response (default OPENAI_CHATGPT_CACHE_TTL_HOURS; 0 = no expiry)")
+    parser.add_argument("--cache-clear", action="store_true", help="Delete all saved ChatGPT responses before running")
+    parser.add_argument(
+        "--concurrency", type=int, default=None,
+        help="Parallel ChatGPT requests (default OPENAI_CHATGPT_CONCURRENCY in config; ignored with --batch)",
+    )
+    parser.add_argument("--rpm", type=int, default=None, help="OpenAI requests per minute to pace to (default OPENAI_CHATGPT_RPM; 0 = unlimited)")
+    parser.add_argument("--tpm", type=int, default=None, help="OpenAI tokens per minute to pace to (default OPENAI_CHATGPT_TPM; 0 = unlimited)")
+    parser.add_argument(
+        "--compact-prompt", action="store_true",
+        help="Send each stock's data as one line of JSON instead of the labelled list (fewer prompt tokens)",
+    )
+    parser.add_argument(
+        "--batch", action="store_true",
+        help="Send the per-stock analyses as one OpenAI Batch API job (about half the cost; waits until the job finishes, up to 24h)",
+    )
     args = parser.parse_args()
 
+    _load_env()
+    if args.cache_clear:
+        print(f"Cleared {clear_response_cache()} saved ChatGPT responses")
+    if args.rpm is not None or args.tpm is not None:
+        set_rate_limits(args.rpm, args.tpm)
     api_key = require_openai_api_key(args.api_key)
     if not PREPARED_NEW_V2.exists():
         print(f"[ERROR] {PREPARED_NEW_V2} not found. Run 04_generate_full_report_v2.py then 05_prepare_chatgpt_data_v2.py.")
         return
 
-    with open(PREPARED_NEW_V2, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    data = read_json(PREPARED_NEW_V2)
     stocks = data.get("stocks", [])[: args.limit]
     if not stocks:
         print("No A+/A stocks in V2 prepared data.")
@@ -281,6 +383,7 @@ def main():
     data_timestamp_yahoo = meta.get("data_timestamp_yahoo")
 
     model = args.model or OPENAI_CHATGPT_MODEL
+    use_cache = False if args.no_cache else None
     valid_tickers = {str(s.get("ticker", "")).strip().upper() for s in stocks}
     stocks_list = "\n".join(
         f"  {s.get('ticker')}  score={s.get('composite_score')}  base={(s.get('base') or {}).get('type')}  rs_pct={(s.get('relative_strength') or {}).get('rs_percentile')}  dist_pivot={(s.get('breakout') or {}).get('distance_to_pivot_pct')}"
@@ -288,7 +391,9 @@ def main():
     )
     order_prompt = ORDER_PROMPT_V2.format(stocks_list=stocks_list)
     print("Asking ChatGPT for recommended order...")
-    order_resp, _ = openai_send(order_prompt, api_key, model=model, max_tokens=500)
+    order_resp, _ = openai_send(
+        order_prompt, api_key, model=model, max_tokens=500, use_cache=use_cache, cache_ttl_hours=args.cache_ttl
+    )
     chatgpt_order = []
     if order_resp:
         ordered = _parse_ticker_order(order_resp, valid_tickers)
@@ -301,7 +406,9 @@ def main():
     ranking_by_my_score = sorted(stocks, key=lambda s: (-(float(s.get("composite_score") or 0)), s.get("ticker") or ""))
 
     print(f"\n{'='*80}\n08 V2: CHATGPT NEW POSITIONS (V2 scan data)\n{'='*80}\n")
-    report_run_ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    # One clock read for the report header and the output filename
+    now = datetime.now()
+    report_run_ts = now.strftime("%Y-%m-%d %H:%M:%S")
     report_lines = [
         "=" * 80, "08 V2: CHATGPT NEW POSITION SUGGESTIONS", "=" * 80,
         f"Report run: {report_run_ts}",
@@ -319,51 +426,93 @@ def main():
     report_lines.append("")
 
     stocks_to_analyze = stocks[: args.max_rank]
-    comparison_rows = []  # (ticker, my_grade, my_score, chatgpt_grade)
-    for i, s in enumerate(stocks_to_analyze, 1):
-        ticker = s.get("ticker", "?")
-        stock_data_section = _build_stock_data_section(s)
-        prompt_text = INDEPENDENT_ANALYSIS_PROMPT.format(
-            stock_data_section=stock_data_section,
+    build_section = _build_stock_data_compact if args.compact_prompt else _build_stock_data_section
+    prompts = [
+        INDEPENDENT_ANALYSIS_PROMPT.format(
+            stock_data_section=build_section(s),
             composite_score=s.get("composite_score") if s.get("composite_score") is not None else "—",
             grade=s.get("grade", "—"),
             status=_status_for_prompt(s),
         )
-        print(f"[{i}/{len(stocks_to_analyze)}] {ticker} ... ", end="", flush=True)
-        content, _ = openai_send(prompt_text, api_key, model=model, max_tokens=min(OPENAI_CHATGPT_MAX_COMPLETION_TOKENS, 8000))
-        if not content:
-            print("FAILED")
-            report_lines.append(f"### {ticker}\n(ChatGPT request failed.)\n")
-            comparison_rows.append((ticker, s.get("grade"), s.get("composite_score"), ""))
-            continue
-        print("OK")
-        cg_grade = _parse_chatgpt_grade_from_response(content)
-        comparison_rows.append((ticker, s.get("grade"), s.get("composite_score"), cg_grade))
-        report_lines.append(f"### {ticker} [{s.get('grade')}] composite={s.get('composite_score')}")
-        report_lines.append("")
-        report_lines.append(content.strip())
-        report_lines.append("")
-        report_lines.append("-" * 80)
-        report_lines.append("")
-
-    # Table: My score vs ChatGPT score (ordered by my composite score)
-    report_lines.append("")
-    report_lines.append("=" * 80)
-    report_lines.append("MY SCORE VS CHATGPT SCORE (ordered by my composite score)")
-    report_lines.append("=" * 80)
-    report_lines.append("")
-    comparison_rows.sort(key=lambda x: (-(float(x[2]) if x[2] is not None else 0), x[0] or ""))
-    report_lines.append("| Rank | Ticker | My Grade | My Score | ChatGPT Grade |")
-    report_lines.append("|" + "---|" * 5)
-    for r, (ticker, my_grade, my_score, cg_grade) in enumerate(comparison_rows, 1):
-        report_lines.append(f"| {r} | {ticker} | {my_grade or '—'} | {my_score or '—'} | {cg_grade or '—'} |")
-    report_lines.append("")
+        for s in stocks_to_analyze
+    ]
+    total = len(stocks_to_analyze)
+    done = [0]
 
     V2_REPORTS.mkdir(parents=True, exist_ok=True)
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+    ts = now.strftime("%Y%m%d_%H%M%S")
     out_file = V2_REPORTS / f"chatgpt_new_positions_v2_{ts}.txt"
-    out_file.write_text("\n".join(report_lines), encoding="utf-8")
-    print(f"Report saved: {out_file}\n")
+    # The report is written as analyses complete (in rank order), so a crash mid-run leaves a .partial file
+    with PartialLinesWriter(out_file) as report:
+        report.write(report_lines)
+        comparison_rows = []  # (ticker, my_grade, my_score, chatgpt_grade)
+        finished: Dict[int, Optional[str]] = {}
+
+        def _write_ready() -> None:
+            # Emit each analysis once every higher-ranked one is done
+            while len(comparison_rows) in finished:
+                s = stocks_to_analyze[len(comparison_rows)]
+                content = finished.pop(len(comparison_rows))
+                ticker = s.get("ticker", "?")
+                if not content:
+                    report.write([f"### {ticker}\n(ChatGPT request failed.)\n"])
+                    comparison_rows.append((ticker, s.get("grade"), s.get("composite_score"), ""))
+                    continue
+                cg_grade = _parse_chatgpt_grade_from_response(content)
+                comparison_rows.append((ticker, s.get("grade"), s.get("composite_score"), cg_grade))
+                report.write([
+                    f"### {ticker} [{s.get('grade')}] composite={s.get('composite_score')}",
+                    "",
+                    content.strip(),
+                    "",
+                    "-" * 80,
+                    "",
+                ])
+
+        def _progress(idx: int, result) -> None:
+            done[0] += 1
+            ticker = stocks_to_analyze[idx].get("ticker", "?")
+            print(f"[{done[0]}/{total}] {ticker} ... {'OK' if result[0] else 'FAILED'}", flush=True)
+            finished[idx] = result[0]
+            _write_ready()
+
+        # Per-stock prompts are independent: send them concurrently (or as one batch job)
+        max_tokens = min(OPENAI_CHATGPT_MAX_COMPLETION_TOKENS, 8000)
+        if args.batch:
+            print(f"Submitting {total} analyses as an OpenAI batch job (polling until it completes)...", flush=True)
+            responses = send_batch(
+                prompts,
+                api_key,
+                model=model,
+                max_tokens=max_tokens,
+                use_cache=use_cache,
+                cache_ttl_hours=args.cache_ttl,
+            )
+            print(f"Batch finished: {sum(1 for content, _ in responses if content)}/{total} OK", flush=True)
+            finished.update((i, content) for i, (content, _) in enumerate(responses))
+            _write_ready()
+        else:
+            send_many(
+                prompts,
+                api_key,
+                model=model,
+                max_tokens=max_tokens,
+                use_cache=use_cache,
+                cache_ttl_hours=args.cache_ttl,
+                max_workers=args.concurrency,
+                on_done=_progress,
+            )
+
+        # Table: My score vs ChatGPT score (ordered by my composite score)
+        table_lines = ["", "=" * 80, "MY SCORE VS CHATGPT SCORE (ordered by my composite score)", "=" * 80, ""]
+        comparison_rows.sort(key=lambda x: (-(float(x[2]) if x[2] is not None else 0), x[0] or ""))
+        table_lines.append("| Rank | Ticker | My Grade | My Score | ChatGPT Grade |")
+        table_lines.append("|" + "---|" * 5)
+        for r, (ticker, my_grade, my_score, cg_grade) in enumerate(comparison_rows, 1):
+            table_lines.append(f"| {r} | {ticker} | {my_grade or '—'} | {my_score or '—'} | {cg_grade or '—'} |")
+        table_lines.append("")
+        report.write(table_lines)
+    print(f"Report saved: {out_file} ({report.size_bytes / 1024:.1f} KB)\n")
 
 
 if __name__ == "__main__":
@@ -39,7 +39,7 @@ class TradingBot:
                       Options: ^GDAXI (DAX), ^FCHI (CAC 40), ^AEX (AEX), ^SSMI (Swiss), ^OMX (Nordics)
         """
         # Load environment variables from .env file
-        env_file = Path(DEFAULT_ENV_PATH)
+        env_file = DEFAULT_ENV_PATH
         if env_file.exists():
             load_dotenv(env_file)
             logger.debug(f"Loaded environment variables from {env_file}")
@@ -129,7 +129,6 @@ class TradingBot:
             Dictionary with scan results for all stocks
         """
         try:
-            from pathlib import Path
             file_path_obj = Path(file_path)
             
             if not file_path_obj.exists():
@@ -1,13 +1,17 @@
 """
 Shared cache helpers for stock data.
-Used by fetch_utils.py, 04_generate_full_report.py.
+Used by fetch_utils.py, 02_fetch_positions_trading212_V2.py, 03_prepare_for_minervini_V2.py,
+04_generate_full_report_v2.py, 05_prepare_chatgpt_data_v2.py.
 """
-import json
 import logging
+import sys
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 
-from config import CACHE_FILE
+import pandas as pd
+
+from config import CACHE_FILE, NEW_PIPELINE_CACHE, NEW_PIPELINE_POSITIONS
+from file_utils import dumps_json, read_json, read_json_cached, write_bytes_atomic
 
 logger = logging.getLogger(__name__)
 
@@ -20,8 +24,7 @@ def load_cached_data() -> Optional[Dict[str, Any]]:
     if not CACHE_FILE.exists():
         return None
     try:
-        with open(CACHE_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        data = read_json(CACHE_FILE)
         if not isinstance(data, dict):
             logger.debug("Cache file content is not a dict")
             return None
@@ -34,5 +37,97 @@ def load_cached_data() -> Optional[Dict[str, Any]]:
 def save_cached_data(data: Dict[str, Any]) -> None:
     """Save stock data to CACHE_FILE. Raises on write error."""
     CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
-    with open(CACHE_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, default=str)
+    # Serialized to bytes up front and written in one call (atomic replace, no text-mode encode pass)
+    write_bytes_atomic(CACHE_FILE, dumps_json(data, indent=True, default=str))
+
+
+def load_pipeline_cache() -> Dict[str, Any]:
+    """
+    Load the pipeline cache (NEW_PIPELINE_CACHE, written by 01/02) for the prepare steps (03, 05).
+    Parsed once per file version (read_json_cached). Empty {"stocks", "metadata"} if missing or invalid.
+    """
+    if not NEW_PIPELINE_CACHE.exists():
+        return {"stocks": {}, "metadata": {}}
+    try:
+        data = read_json_cached(NEW_PIPELINE_CACHE)
+        return data if isinstance(data, dict) else {"stocks": {}, "metadata": {}}
+    except Exception as e:
+        logger.warning("Could not load cache: %s", e)
+        return {"stocks": {}, "metadata": {}}
+
+
+def load_pipeline_positions() -> List[Dict[str, Any]]:
+    """Trading212 positions saved by 02 (NEW_PIPELINE_POSITIONS); [] if missing or invalid."""
+    if not NEW_PIPELINE_POSITIONS.exists():
+        return []
+    try:
+        data = read_json(NEW_PIPELINE_POSITIONS)
+        return data.get("positions", [])
+    except Exception as e:
+        logger.warning("Could not load positions: %s", e)
+        return []
+
+
+PRICE_COLUMNS = ("Open", "High", "Low", "Close")
+
+
+def hist_to_cache_dict(hist: pd.DataFrame, eur_usd_rate: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Convert a historical OHLCV DataFrame to the cache 'historical_data' shape
+    ({"index": [str, ...], "data": {column: [value, ...]}}). Columns are stored as parallel lists
+    (no per-day dict repeating every key), which readers turn into arrays without a per-row pass.
+    When eur_usd_rate is given, price columns are converted EUR -> USD on the
+    DataFrame (vectorized, rounded to 4 decimals) before the records are built.
+    """
+    if eur_usd_rate and eur_usd_rate > 0:
+        cols = [c for c in PRICE_COLUMNS if c in hist.columns]
+        if cols:
+            hist = hist.copy()
+            hist[cols] = (hist[cols].astype(float) * eur_usd_rate).round(4)
+    return {
+        "index": [str(idx) for idx in hist.index],
+        "data": hist.to_dict("list"),
+    }
+
+
+def hist_columns(hist_dict: Optional[Dict[str, Any]]) -> Dict[str, list]:
+    """
+    historical_data 'data' as column lists ({} when missing/empty). Cache files written before the
+    column layout hold per-day records; those are converted once and stored back into hist_dict,
+    so later readers of the same entry get the columns directly.
+    """
+    data = hist_dict.get("data") if hist_dict else None
+    if not data:
+        return {}
+    if isinstance(data, dict):
+        return data
+    keys = dict.fromkeys(key for rec in data for key in rec)
+    columns = {key: [rec.get(key) for rec in data] for key in keys}
+    hist_dict["data"] = columns
+    return columns
+
+
+# Per-stock string fields that repeat across the universe (a handful of benchmarks, currencies, sectors)
+_REPEATED_STRING_FIELDS = ("benchmark_index", "currency", "exchange", "sector", "industry")
+
+
+def intern_cache_strings(stocks: Dict[str, Any]) -> None:
+    """
+    Intern strings repeated across cached stocks, in place: the historical_data index dates
+    (every ticker on an exchange shares the same calendar) and small metadata fields.
+    A JSON load creates a separate str per occurrence; after this there is one object per value.
+    """
+    intern = sys.intern
+    for entry in stocks.values():
+        if not isinstance(entry, dict):
+            continue
+        hist = entry.get("historical_data")
+        if isinstance(hist, dict) and isinstance(hist.get("index"), list):
+            hist["index"] = [intern(s) if isinstance(s, str) else s for s in hist["index"]]
+        for fields in (entry, entry.get("stock_info")):
+            if not isinstance(fields, dict):
+                continue
+            for key in _REPEATED_STRING_FIELDS:
+                value = fields.get(key)
+                if isinstance(value, str):
+                    fields[key] = intern(value)
@@ -47,13 +47,29 @@ OPENAI_CHATGPT_MAX_A_GRADE_STOCKS = 9999  # Max A+ and A stocks in one prompt (9
 OPENAI_CHATGPT_MAX_PRE_BREAKOUT_STOCKS = 9999  # Max pre-breakout setups in one prompt (9999 = send all)
 OPENAI_CHATGPT_INCLUDE_FULL_SCAN_DATA = False  # If False, report omits duplicate "ORIGINAL SCAN DATA" block (smaller file)
 OPENAI_CHATGPT_RETRY_ATTEMPTS = 3  # Retries on rate limit / transient errors
-OPENAI_CHATGPT_RETRY_BASE_SECONDS = 60  # First backoff wait (then 120, 180...)
+OPENAI_CHATGPT_RETRY_BASE_SECONDS = 60  # First backoff wait (then 120, 240... plus jitter; Retry-After wins when sent)
+OPENAI_CHATGPT_RETRY_MAX_SECONDS = 300  # Cap on a single backoff wait
+OPENAI_CHATGPT_CONTEXT_TOKENS = 400000  # Model context window (prompt + completion); completion budget is clamped to fit
+OPENAI_CHATGPT_CONCURRENCY = 4  # Parallel ChatGPT requests for independent per-stock prompts (1 = sequential)
+OPENAI_CHATGPT_TOKENS_PER_SECOND = 50  # Conservative throughput for sizing request timeouts (OPENAI_API_TIMEOUT is the floor)
+OPENAI_CHATGPT_USE_CACHE = True  # Reuse saved responses for byte-identical prompts (06/07 --no-cache to bypass)
+OPENAI_CHATGPT_CACHE_DIR = Path("reportsV2") / ".chatgpt_cache"  # One JSON file per cached response
+OPENAI_CHATGPT_CACHE_TTL_HOURS = 24  # Saved responses older than this are re-requested (06/07 --cache-ttl; 0 = never expire)
+OPENAI_CHATGPT_RPM = 500  # Requests per minute the client paces itself to (set to your account tier; 0 = unlimited)
+OPENAI_CHATGPT_TPM = 500000  # Tokens per minute (prompt estimate + completion budget per request; 0 = unlimited)
+OPENAI_BATCH_POLL_SECONDS = 60  # How often 07 --batch checks a submitted Batch API job (results within 24h)
+OPENAI_HTTP_MAX_CONNECTIONS = 32  # Connection pool of the shared OpenAI client (HTTP/2 when the h2 package is installed)
 
 DATA_PROVIDER_TIMEOUT = 30  # seconds for data provider API calls
 # Purpose: Maximum time to wait for stock data API responses
 # Used by: StockDataProvider (yfinance, Alpha Vantage)
 # Why important: Prevents hanging when data providers are slow
 
+HTTP_POOL_SIZE = 16  # keep-alive connections per host for the data provider HTTP session
+# Purpose: Size of the pooled requests.Session used for Alpha Vantage calls
+# Used by: StockDataProvider
+# Why important: Reuses TLS connections instead of a new handshake per request
+
 # Yahoo Finance batch download (rate-limit mitigation)
 YF_BATCH_CHUNK_SIZE = 150  # tickers per chunk; smaller = gentler on Yahoo, more chunks = longer run
 YF_BATCH_CHUNK_DELAY_SEC = 45  # seconds to wait between chunks to avoid rate limits
@@ -83,7 +99,7 @@ DEFAULT_RULESET_PATH = "ruleset.json"
 # Used by: Trading bot rule engine
 # Why important: Centralizes trading rules configuration
 
-DEFAULT_ENV_PATH = ".env"
+DEFAULT_ENV_PATH = Path(".env")
 # Purpose: Path to environment variables file
 # Used by: All modules that need API keys or secrets
 # Why important: Keeps sensitive credentials out of code
@@ -103,6 +119,10 @@ CACHE_FILE = Path("data/cached_stock_data.json")
 # Purpose: Legacy cache path (optional; pipeline uses cached_stock_data_new_pipeline.json)
 # Used by: cache_utils
 
+EUR_USD_RATE_CACHE_FILE = Path("data/.eur_usd_rate.json")
+# Purpose: Last fetched EUR/USD rate; reused for the rest of the calendar day instead of a new Yahoo request
+# Used by: currency_utils.py (get_eur_usd_rate_with_date_cached), 05_prepare_chatgpt_data_v2.py
+
 FAILED_FETCH_LIST = Path("data/failed_fetch.txt")
 # Purpose: List of tickers that failed to fetch (one per line), updated after each fetch
 # Used by: fetch_utils.py (when run standalone)
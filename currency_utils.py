@@ -4,9 +4,13 @@ All data and calculations stay in USD; convert to EUR only at report time for po
 Uses Yahoo Finance EURUSD=X (USD per 1 EUR) for the rate.
 """
 import os
+from datetime import date
 from typing import Optional, Tuple
 import logging
 
+from config import EUR_USD_RATE_CACHE_FILE
+from file_utils import dumps_json, read_json, write_bytes_atomic
+
 logger = logging.getLogger(__name__)
 
 # Yahoo ticker: EUR/USD rate = how many USD per 1 EUR
@@ -41,6 +45,31 @@ def get_eur_usd_rate_with_date() -> Tuple[Optional[float], Optional[str]]:
         return (None, None)
 
 
+def get_eur_usd_rate_with_date_cached() -> Tuple[Optional[float], Optional[str]]:
+    """
+    get_eur_usd_rate_with_date, fetched at most once per calendar day: a successful result is kept in
+    EUR_USD_RATE_CACHE_FILE and reused until the date changes (the daily rate does not move in between).
+    Failed fetches are not cached, so the next call retries.
+    """
+    today = date.today().isoformat()
+    try:
+        cached = read_json(EUR_USD_RATE_CACHE_FILE)
+        if cached.get("fetched_on") == today and cached.get("rate"):
+            return (float(cached["rate"]), cached.get("date"))
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.debug("Ignoring unreadable EUR/USD rate cache %s: %s", EUR_USD_RATE_CACHE_FILE, e)
+    rate, date_iso = get_eur_usd_rate_with_date()
+    if rate:
+        try:
+            EUR_USD_RATE_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+            write_bytes_atomic(EUR_USD_RATE_CACHE_FILE, dumps_json({"rate": rate, "date": date_iso, "fetched_on": today}))
+        except OSError as e:
+            logger.debug("Could not write EUR/USD rate cache %s: %s", EUR_USD_RATE_CACHE_FILE, e)
+    return (rate, date_iso)
+
+
 def get_eur_usd_rate() -> Optional[float]:
     """
     Get latest EUR/USD rate from Yahoo Finance (USD per 1 EUR).
@@ -8,10 +8,12 @@ Fetches stock data from multiple sources with automatic fallback:
 import os
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
 import time
 from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
 from ticker_utils import clean_ticker
+from config import HTTP_POOL_SIZE
 import logging
 
 # Try to import yfinance (Yahoo Finance)
@@ -70,6 +72,12 @@ class StockDataProvider:
         _disable = os.environ.get("DISABLE_SSL_VERIFY", "").strip().lower() in ("1", "true", "yes")
         self._verify_ssl = not _disable
         self._session = None
+        # Pooled keep-alive session for Alpha Vantage (one TLS handshake per host, not per request)
+        self._http = requests.Session()
+        # Pooling only: retries stay with the existing per-call error handling
+        adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+        self._http.mount("https://", adapter)
+        self._http.mount("http://", adapter)
         if _disable:
             try:
                 from curl_cffi import requests as curl_requests
@@ -112,7 +120,7 @@ class StockDataProvider:
                 "apikey": self.alpha_vantage_key
             }
             
-            response = requests.get(url, params=params, timeout=30, verify=self._verify_ssl)
+            response = self._http.get(url, params=params, timeout=30, verify=self._verify_ssl)
             
             if response.status_code == 200:
                 overview = response.json()
@@ -128,7 +136,7 @@ class StockDataProvider:
                     "apikey": self.alpha_vantage_key
                 }
                 
-                income_response = requests.get(url, params=income_params, timeout=30, verify=self._verify_ssl)
+                income_response = self._http.get(url, params=income_params, timeout=30, verify=self._verify_ssl)
                 income_data = {}
                 income_reports = []
                 if income_response.status_code == 200:
@@ -144,7 +152,7 @@ class StockDataProvider:
                     "apikey": self.alpha_vantage_key
                 }
                 
-                balance_response = requests.get(url, params=balance_params, timeout=30, verify=self._verify_ssl)
+                balance_response = self._http.get(url, params=balance_params, timeout=30, verify=self._verify_ssl)
                 balance_data = {}
                 if balance_response.status_code == 200:
                     balance_json = balance_response.json()
@@ -247,7 +255,7 @@ class StockDataProvider:
                 "datatype": "json"
             }
             
-            response = requests.get(url, params=params, timeout=30, verify=self._verify_ssl)
+            response = self._http.get(url, params=params, timeout=30, verify=self._verify_ssl)
             
             if response.status_code == 200:
                 data = response.json()
@@ -10,12 +10,12 @@ The HTML is self-contained (no external CSS/JS) so it can be hosted on GitHub Pa
 """
 from __future__ import annotations
 
-import json
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Dict, List, Tuple
 
 from config import REPORTS_DIR_V2, SCAN_RESULTS_V2_LATEST
+from file_utils import dumps_json, read_json_cached, write_text_if_changed
 
 
 @dataclass
@@ -271,8 +271,9 @@ def _build_html(
         )
 
     rows_html = "\n".join(row_html_parts)
-    rows_json = json.dumps(rows_data, ensure_ascii=False)
-    details_json = json.dumps(details_map, ensure_ascii=False)
+    # Embedded as JS literals; compact orjson output when installed (same data as json.dumps)
+    rows_json = dumps_json(rows_data).decode("utf-8")
+    details_json = dumps_json(details_map).decode("utf-8")
 
     html = f"""<!DOCTYPE html>
 <html lang="en">
@@ -888,8 +889,7 @@ def main() -> None:
     if not SCAN_RESULTS_V2_LATEST.exists():
         raise SystemExit(f"No scan results found at {SCAN_RESULTS_V2_LATEST}. Run the V2 scan first.")
 
-    with open(SCAN_RESULTS_V2_LATEST, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    data = read_json_cached(SCAN_RESULTS_V2_LATEST)
 
     # V2 scan writes a list of records
     if isinstance(data, dict) and "results" in data:
@@ -911,9 +911,11 @@ def main() -> None:
     docs_dir.mkdir(parents=True, exist_ok=True)
     html = _build_html(rows, summary, details_map, data_timestamp, report_run_timestamp)
     output_path = docs_dir / "index.html"
-    output_path.write_text(html, encoding="utf-8")
-
-    print(f"Rank table HTML written to {output_path} ({len(rows)} rows).")
+    # Reruns on the same scan produce the same page: leave docs/index.html untouched then
+    if write_text_if_changed(output_path, html):
+        print(f"Rank table HTML written to {output_path} ({len(rows)} rows).")
+    else:
+        print(f"Rank table HTML unchanged: {output_path} ({len(rows)} rows).")
 
 
 if __name__ == "__main__":
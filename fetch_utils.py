@@ -16,6 +16,7 @@ from config import (
     YF_BATCH_CHUNK_DELAY_SEC,
 )
 from currency_utils import get_eur_usd_rate
+from cache_utils import hist_to_cache_dict
 
 logger = get_logger(__name__)
 
@@ -34,17 +35,10 @@ def fetch_stock_data(ticker: str, bot: TradingBot) -> Dict:
                 "fetched_at": datetime.now().isoformat(),
             }
         stock_info = bot.data_provider.get_stock_info(ticker)
-        hist_dict = {
-            "index": [str(idx) for idx in hist.index],
-            "data": hist.to_dict("records"),
-        }
+        rate = None
         if (stock_info or {}).get("currency") == "EUR":
             rate = get_eur_usd_rate()
             if rate and rate > 0:
-                for row in hist_dict["data"]:
-                    for key in ("Open", "High", "Low", "Close"):
-                        if key in row and row[key] is not None:
-                            row[key] = round(float(row[key]) * rate, 4)
                 if stock_info:
                     for key in ("current_price", "52_week_high", "52_week_low"):
                         if stock_info.get(key) is not None:
@@ -60,6 +54,7 @@ def fetch_stock_data(ticker: str, bot: TradingBot) -> Dict:
                     "EUR/USD rate unavailable for %s; cached data left in EUR (downstream may assume USD).",
                     ticker,
                 )
+        hist_dict = hist_to_cache_dict(hist, rate)
         return {
             "ticker": ticker,
             "data_available": True,
@@ -104,24 +99,19 @@ def _build_result_from_hist(
     hist,
     stock_info: Dict,
     eur_usd_rate: float,
+    fetched_at: str,
 ) -> Dict:
     """Build cache result dict from hist DataFrame and stock_info (same shape as fetch_stock_data)."""
-    hist_dict = {
-        "index": [str(idx) for idx in hist.index],
-        "data": hist.to_dict("records"),
-    }
-    if (stock_info or {}).get("currency") == "EUR" and eur_usd_rate and eur_usd_rate > 0:
-        for row in hist_dict["data"]:
-            for key in ("Open", "High", "Low", "Close"):
-                if key in row and row[key] is not None:
-                    row[key] = round(float(row[key]) * eur_usd_rate, 4)
+    is_eur = (stock_info or {}).get("currency") == "EUR"
+    hist_dict = hist_to_cache_dict(hist, eur_usd_rate if is_eur else None)
+    if is_eur and eur_usd_rate and eur_usd_rate > 0:
         if stock_info:
             for key in ("current_price", "52_week_high", "52_week_low"):
                 if stock_info.get(key) is not None:
                     stock_info[key] = round(float(stock_info[key]) * eur_usd_rate, 4)
             stock_info["currency"] = "USD"
             stock_info["original_currency"] = "EUR"
-    elif (stock_info or {}).get("currency") == "EUR":
+    elif is_eur:
         if stock_info:
             stock_info["original_currency"] = "EUR"
             stock_info["rate_unavailable"] = True
@@ -132,7 +122,7 @@ def _build_result_from_hist(
         "stock_info": stock_info or {},
         "data_points": len(hist),
         "date_range": {"start": str(hist.index[0]), "end": str(hist.index[-1])},
-        "fetched_at": datetime.now().isoformat(),
+        "fetched_at": fetched_at,
     }
 
 
@@ -157,6 +147,8 @@ def fetch_stock_data_batch(tickers: List[str], bot: TradingBot, stock_info_worke
             logger.info("Waiting %ds before next chunk (rate-limit mitigation)...", YF_BATCH_CHUNK_DELAY_SEC)
             time.sleep(YF_BATCH_CHUNK_DELAY_SEC)
     min_rows = 200
+    # One timestamp for the whole batch (uniform fetched_at across tickers)
+    fetched_at = datetime.now().isoformat()
     ok_tickers = [t for t in tickers if t in hist_by_ticker and len(hist_by_ticker[t]) >= min_rows]
     results: Dict[str, Dict] = {}
     for t in tickers:
@@ -167,7 +159,7 @@ def fetch_stock_data_batch(tickers: List[str], bot: TradingBot, stock_info_worke
                     len(hist_by_ticker.get(t, [])) if t in hist_by_ticker else 0, min_rows
                 ),
                 "data_available": False,
-                "fetched_at": datetime.now().isoformat(),
+                "fetched_at": fetched_at,
             }
     if not ok_tickers:
         return results
@@ -193,5 +185,6 @@ def fetch_stock_data_batch(tickers: List[str], bot: TradingBot, stock_info_worke
             hist_by_ticker[t],
             info_by_ticker.get(t, {}),
             rate or 0.0,
+            fetched_at,
         )
     return results
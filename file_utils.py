@@ -0,0 +1,231 @@
+"""
+Shared file I/O helpers for pipeline JSON files.
+Uses orjson when installed (parses UTF-8 bytes directly, several times faster than stdlib json
+on the number-heavy scan/cache files); falls back to stdlib json otherwise.
+Used by the 01-07 V2 pipeline scripts, the shared *_utils modules, watchlist_loader.py,
+position_sizing.py and export_rank_table_for_web_v2.py.
+"""
+import json
+import logging
+import mmap
+import os
+import pickle
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Iterable, Iterator, Optional, Union
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+PathLike = Union[str, Path]
+
+
+def loads_json(data: Union[bytes, str]) -> Any:
+    """
+    Parse JSON text/bytes. orjson is strict (rejects NaN/Infinity literals that stdlib
+    json.dump writes for float NaN), so such documents fall back to stdlib json.
+    """
+    if ORJSON_AVAILABLE:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            logger.debug("orjson could not parse document; falling back to stdlib json")
+    return json.loads(data)
+
+
+def read_json(path: PathLike) -> Any:
+    """
+    Read and parse a JSON file (no text-mode decode pass). Raises on missing/invalid file.
+    With orjson the file is memory-mapped and parsed in place, so multi-hundred-MB cache files
+    are not first copied into a Python bytes object.
+    """
+    path = Path(path)
+    if ORJSON_AVAILABLE:
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size > 0:  # mmap cannot map an empty file
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    with memoryview(mm) as view:
+                        try:
+                            return orjson.loads(view)
+                        except orjson.JSONDecodeError:
+                            logger.debug("orjson could not parse %s; falling back to stdlib json", path)
+                    return json.loads(mm[:])
+    return loads_json(path.read_bytes())
+
+
+def load_with_sidecar(path: PathLike, parse: Callable[[Path], Any]) -> Any:
+    """
+    parse(path) with a pickle sidecar (path + ".pkl") keyed on the file's mtime and size: while the
+    file is unchanged, later runs unpickle the parsed object instead of parsing again. The sidecar is
+    rewritten whenever the file changes; an unreadable sidecar just falls back to parsing. Raises like parse.
+    """
+    path = Path(path)
+    sidecar = path.with_name(path.name + ".pkl")
+    st = path.stat()
+    key = (st.st_mtime_ns, st.st_size)
+    try:
+        with open(sidecar, "rb") as f:
+            if pickle.load(f) == key:
+                return pickle.load(f)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.debug("Ignoring unreadable sidecar %s: %s", sidecar, e)
+    data = parse(path)
+    try:
+        write_bytes_atomic(
+            sidecar,
+            pickle.dumps(key, protocol=pickle.HIGHEST_PROTOCOL) + pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL),
+        )
+    except OSError as e:
+        logger.debug("Could not write sidecar %s: %s", sidecar, e)
+    return data
+
+
+def read_json_cached(path: PathLike) -> Any:
+    """
+    read_json through load_with_sidecar: unpickling the multi-MB cache/scan files is about twice as
+    fast as parsing them. Raises like read_json.
+    """
+    return load_with_sidecar(path, read_json)
+
+
+def json_default(obj: Any) -> Any:
+    """default= hook for dumps_json: numpy scalars to Python numbers/bools, dates to ISO strings, else str()."""
+    # numpy is not imported here (keeps this module, and openai_utils, light to import);
+    # if the caller never loaded numpy, obj cannot be a numpy scalar
+    np = sys.modules.get("numpy")
+    if np is not None and isinstance(obj, np.generic):
+        return obj.item()
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    return str(obj)
+
+
+def dumps_json(obj: Any, *, indent: bool = False, default: Optional[Callable[[Any], Any]] = None) -> bytes:
+    """
+    Serialize obj to UTF-8 JSON bytes (indent=True: 2-space indent, same layout as json.dump(indent=2)).
+    orjson serializes numpy scalars/arrays and datetimes natively and writes NaN/Infinity as null
+    (valid JSON); the stdlib fallback keeps NaN literals. default is called for other types.
+    """
+    if ORJSON_AVAILABLE:
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=default, option=option)
+    return json.dumps(obj, indent=2 if indent else None, ensure_ascii=False, default=default).encode("utf-8")
+
+
+@contextmanager
+def _atomic_open(path: PathLike) -> Iterator[BinaryIO]:
+    """Binary handle on a temp file next to path; moved over path on success, removed on failure."""
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    try:
+        with open(tmp, "wb") as f:
+            yield f
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def write_bytes_atomic(path: PathLike, data: bytes) -> None:
+    """
+    Write data to path in a single write, via a temp file in the same directory and os.replace,
+    so readers never see a partially written file (e.g. after a crash mid-run).
+    """
+    with _atomic_open(path) as f:
+        f.write(data)
+
+
+def write_text_atomic(path: PathLike, text: str, encoding: str = "utf-8") -> None:
+    """Atomic text write (see write_bytes_atomic)."""
+    write_bytes_atomic(path, text.encode(encoding))
+
+
+def write_text_if_changed(path: PathLike, text: str, encoding: str = "utf-8") -> bool:
+    """
+    write_text_atomic, skipped when path already holds exactly these bytes (keeps the file's mtime and
+    avoids a rewrite on reruns with unchanged input). Returns True if the file was written.
+    """
+    path = Path(path)
+    data = text.encode(encoding)
+    try:
+        if path.stat().st_size == len(data) and path.read_bytes() == data:
+            logger.debug("%s unchanged, skipping write", path)
+            return False
+    except OSError:
+        pass
+    write_bytes_atomic(path, data)
+    return True
+
+
+def outputs_up_to_date(outputs: Iterable[PathLike], inputs: Iterable[PathLike]) -> bool:
+    """
+    True when every output exists and is newer than every existing input (mtime), i.e. a rerun
+    would rebuild the same files from the same inputs. Costs a few stat calls.
+    """
+    try:
+        oldest_output = min(Path(p).stat().st_mtime_ns for p in outputs)
+    except (OSError, ValueError):  # an output is missing (or none given)
+        return False
+    return all(oldest_output > Path(p).stat().st_mtime_ns for p in inputs if Path(p).exists())
+
+
+def write_lines_atomic(path: PathLike, lines: Iterable[str], encoding: str = "utf-8") -> int:
+    """
+    Atomic write of lines separated by newlines (same bytes as write_text_atomic(path, "\n".join(lines))),
+    streamed line by line through the file buffer instead of building the joined report string first.
+    Returns the number of bytes written.
+    """
+    with _atomic_open(path) as f:
+        for i, line in enumerate(lines):
+            if i:
+                f.write(b"\n")
+            f.write(line.encode(encoding))
+        return f.tell()
+
+
+class PartialLinesWriter:
+    """
+    Context manager that writes newline-separated lines to path + ".partial" as they are produced
+    (flushed after each write call) and renames it to path on normal exit. On an error the partial
+    file is kept, so output completed before a crash survives. The final file has the same bytes as
+    write_lines_atomic(path, all_lines); size_bytes holds its length after exit.
+    """
+
+    def __init__(self, path: PathLike, encoding: str = "utf-8"):
+        self.path = Path(path)
+        self.partial_path = self.path.with_name(self.path.name + ".partial")
+        self.encoding = encoding
+        self.size_bytes = 0
+        self._f: Optional[BinaryIO] = None
+        self._started = False
+
+    def __enter__(self) -> "PartialLinesWriter":
+        self._f = open(self.partial_path, "wb")
+        return self
+
+    def write(self, lines: Iterable[str]) -> None:
+        for line in lines:
+            if self._started:
+                self._f.write(b"\n")
+            self._f.write(line.encode(self.encoding))
+            self._started = True
+        self._f.flush()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.size_bytes = self._f.tell()
+        self._f.close()
+        if exc_type is None:
+            os.replace(self.partial_path, self.path)
+        else:
+            logger.warning("Incomplete output kept in %s", self.partial_path)
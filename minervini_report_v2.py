@@ -3,9 +3,13 @@ Minervini SEPA V2 – User-friendly report and CSV export.
 Consumes final scan JSON only; no scoring or metric computation.
 Pure Python, deterministic, no LLM.
 """
+import csv
+import heapq
+import io
 from pathlib import Path
 from datetime import datetime
 from typing import List, Dict, Optional
+from file_utils import write_text_atomic
 from config import (
     REPORTS_DIR_V2,
     USER_REPORT_SUBDIR_V2,
@@ -71,13 +75,35 @@ def _safe_float(x, default: float = 0.0, round_to: Optional[int] = None) -> floa
 LATE_STAGE_BASE_DEPTH_PCT = 20.0
 # Low RS threshold for important note
 LOW_RS_PERCENTILE_THRESHOLD = 70.0
+# Column order of the CSV summary (export_scan_summary_to_csv)
+_CSV_COLUMNS = (
+    "ticker", "grade", "composite_score", "base_type", "depth_pct", "pivot_source",
+    "rs_percentile", "power_rank", "distance_to_pivot_pct", "reward_to_risk", "stop_price",
+)
+# Sort position for Early Candidates (A+ then A then B; anything else last)
+_GRADE_SORT_ORDER = {"A+": 0, "A": 1, "B": 2}
+
+
+def _is_early_candidate(r: Dict) -> bool:
+    """A+/A/B with trend, RS percentile and distance to pivot inside the EARLY_* windows."""
+    if r.get("grade") not in ("A+", "A", "B"):
+        return False
+    trend_s = _safe_float(r.get("trend_score"), default=0)
+    rs_pct = _safe_float((r.get("relative_strength") or {}).get("rs_percentile"), default=0)
+    dist = _safe_float((r.get("breakout") or {}).get("distance_to_pivot_pct"), default=-999)
+    return (
+        EARLY_TREND_SCORE_MIN <= trend_s <= EARLY_TREND_SCORE_MAX
+        and EARLY_RS_PERCENTILE_MIN <= rs_pct <= EARLY_RS_PERCENTILE_MAX
+        and EARLY_DIST_TO_PIVOT_MIN_PCT <= dist <= EARLY_DIST_TO_PIVOT_MAX_PCT
+    )
 
 
 def _status_line(r: Dict) -> str:
     """Status: Ready | Triggered | Extended | Developing."""
     grade = r.get("grade") or ""
-    dist = _safe_float(r.get("breakout", {}).get("distance_to_pivot_pct"), default=0, round_to=2)
-    in_breakout = r.get("breakout", {}).get("in_breakout", False)
+    br = r.get("breakout") or {}
+    dist = _safe_float(br.get("distance_to_pivot_pct"), default=0, round_to=2)
+    in_breakout = br.get("in_breakout", False)
     if -3 <= dist <= 0 and grade in ("A+", "A"):
         return "Ready - Tight base, strong RS, not extended."
     if in_breakout:
@@ -92,7 +118,8 @@ def _status_line(r: Dict) -> str:
 def _important_notes(r: Dict) -> List[str]:
     """Risk/info remarks for this stock: Extended, Late-stage base, Low RS, In breakout."""
     notes = []
-    dist = _safe_float((r.get("breakout") or {}).get("distance_to_pivot_pct"))
+    br = r.get("breakout") or {}
+    dist = _safe_float(br.get("distance_to_pivot_pct"))
     if dist > EXTENDED_RISK_WARNING_PCT:
         notes.append(f"Extended (>{EXTENDED_RISK_WARNING_PCT}% above pivot)")
     depth = _safe_float((r.get("base") or {}).get("depth_pct"))
@@ -101,7 +128,7 @@ def _important_notes(r: Dict) -> List[str]:
     rs_pct = (r.get("relative_strength") or {}).get("rs_percentile")
     if rs_pct is not None and _safe_float(rs_pct) < LOW_RS_PERCENTILE_THRESHOLD:
         notes.append(f"Low RS percentile (<{LOW_RS_PERCENTILE_THRESHOLD:.0f})")
-    if r.get("breakout", {}).get("in_breakout", False):
+    if br.get("in_breakout", False):
         notes.append("In breakout (already triggered)")
     return notes
 
@@ -174,8 +201,13 @@ def _detailed_block(r: Dict) -> List[str]:
     rs = _safe_float(r.get("rs_score"), round_to=1)
     v = _safe_float(r.get("volume_score"), round_to=1)
     br = _safe_float(r.get("breakout_score"), round_to=1)
-    dist = _safe_float((r.get("breakout") or {}).get("distance_to_pivot_pct"))
-    rs_pct = (r.get("relative_strength") or {}).get("rs_percentile")
+    # Sub-dicts bound once and reused by the score lines and the metrics lines
+    base = r.get("base") or {}
+    rs_block = r.get("relative_strength") or {}
+    br_block = r.get("breakout") or {}
+    risk = r.get("risk") or {}
+    dist = _safe_float(br_block.get("distance_to_pivot_pct"))
+    rs_pct = rs_block.get("rs_percentile")
 
     lines = [
         f"----- {ticker} -----",
@@ -196,21 +228,17 @@ def _detailed_block(r: Dict) -> List[str]:
         f"  Volume: {v}  ({_volume_band_description(v)})",
         f"  Breakout: {br} ({_breakout_band_description(br, dist)})",
     ])
-    base = r.get("base") or {}
     lines.append(f"Base: {base.get('type', '?')} ({_safe_float(base.get('length_weeks'), round_to=1)} weeks, {_safe_float(base.get('depth_pct'), round_to=1)}% deep)")
     prior = base.get("prior_run_pct")
     lines.append(f"Prior Run: {f'+{_safe_float(prior, round_to=0)}%' if prior is not None else '—'}")
-    rs_block = r.get("relative_strength") or {}
-    pct = rs_block.get("rs_percentile")
-    lines.append(f"RS Percentile: {_safe_float(pct, round_to=0) if pct is not None else '—'}")
-    lines.append(f"RSI: {_safe_float(rs_block.get('rsi_14'), round_to=0) if rs_block.get('rsi_14') is not None else '—'}")
-    br_block = r.get("breakout") or {}
+    lines.append(f"RS Percentile: {_safe_float(rs_pct, round_to=0) if rs_pct is not None else '—'}")
+    rsi = rs_block.get("rsi_14")
+    lines.append(f"RSI: {_safe_float(rsi, round_to=0) if rsi is not None else '—'}")
     pivot_val = br_block.get("pivot_price")
     pivot_src = br_block.get("pivot_source") or ""
     pivot_str = f"{_safe_float(pivot_val, round_to=2)}" + (f"  (source: {pivot_src})" if pivot_src else "") if pivot_val is not None else "—"
     lines.append(f"Pivot: {pivot_str}")
     lines.append(f"Distance to Pivot: {_safe_float(br_block.get('distance_to_pivot_pct'), round_to=1)}%")
-    risk = r.get("risk") or {}
     stop_val = risk.get("stop_price")
     stop_str = f"{_safe_float(stop_val, round_to=2)} ({risk.get('stop_method', 'fixed')} method)" if stop_val is not None else "—"
     lines.append(f"Stop: {stop_str}")
@@ -358,17 +386,43 @@ def generate_user_friendly_report(
         [r for r in scan_results if isinstance(r, dict)],
         key=lambda x: (not x.get("eligible", True), -_safe_float(x.get("composite_score"), default=0)),
     )
-    eligible = [r for r in sorted_results if r.get("eligible", False)]
-    actionable = [r for r in eligible if r.get("grade") in ("A+", "A")]
-    watchlist = [r for r in eligible if r.get("grade") == "B"]
-
-    rs_percentiles = [
-        _safe_float(r.get("relative_strength", {}).get("rs_percentile"))
-        for r in eligible
-        if r.get("relative_strength", {}).get("rs_percentile") is not None
-    ]
+    # One pass over the sorted results: eligible buckets, RS percentiles, breakout count
+    eligible: List[Dict] = []
+    actionable: List[Dict] = []
+    watchlist: List[Dict] = []
+    rs_percentiles: List[float] = []
+    in_breakout_count = 0
+    for r in sorted_results:
+        if not r.get("eligible", False):
+            continue
+        eligible.append(r)
+        grade = r.get("grade")
+        if grade in ("A+", "A"):
+            actionable.append(r)
+        elif grade == "B":
+            watchlist.append(r)
+        rs_pct = r.get("relative_strength", {}).get("rs_percentile")
+        if rs_pct is not None:
+            rs_percentiles.append(_safe_float(rs_pct))
+        if r.get("breakout", {}).get("in_breakout"):
+            in_breakout_count += 1
     avg_rs_pct = sum(rs_percentiles) / len(rs_percentiles) if rs_percentiles else 0
-    in_breakout_count = sum(1 for r in eligible if r.get("breakout", {}).get("in_breakout"))
+
+    # Early candidates overlap the top-80 list: build each stock's detailed block and note once
+    detailed_cache: Dict[int, List[str]] = {}
+    note_cache: Dict[int, str] = {}
+
+    def _detailed(r: Dict) -> List[str]:
+        block = detailed_cache.get(id(r))
+        if block is None:
+            block = detailed_cache[id(r)] = _detailed_block(r)
+        return block
+
+    def _note(r: Dict) -> str:
+        note = note_cache.get(id(r))
+        if note is None:
+            note = note_cache[id(r)] = _important_note_short(r)
+        return note
 
     lines = []
     lines.append(f"Report run: {report_run_timestamp}")
@@ -400,51 +454,35 @@ def generate_user_friendly_report(
         ticker = r.get("ticker", "?")
         grade = r.get("grade", "?")
         score = _safe_float(r.get("composite_score"), round_to=1)
-        base_type = (r.get("base") or {}).get("type", "—")
-        depth = _safe_float((r.get("base") or {}).get("depth_pct"), round_to=1)
+        base = r.get("base") or {}
+        risk = r.get("risk") or {}
+        base_type = base.get("type", "—")
+        depth = _safe_float(base.get("depth_pct"), round_to=1)
         rs_pct = (r.get("relative_strength") or {}).get("rs_percentile")
         rs_str = f"{_safe_float(rs_pct, round_to=1)}" if rs_pct is not None else "—"
         dist = _safe_float((r.get("breakout") or {}).get("distance_to_pivot_pct"), round_to=1)
-        rr = (r.get("risk") or {}).get("reward_to_risk")
+        rr = risk.get("reward_to_risk")
         rr_str = f"{_safe_float(rr, round_to=1)}" if rr is not None else "—"
-        stop = (r.get("risk") or {}).get("stop_price")
+        stop = risk.get("stop_price")
         stop_str = f"{_safe_float(stop, round_to=2)}" if stop is not None else "—"
-        note_str = _important_note_short(r)
+        note_str = _note(r)
         lines.append(f"| {i} | {ticker} | {grade} | {score} | {base_type} | {depth} | {rs_str} | {dist} | {rr_str} | {stop_str} | {note_str} |")
     lines.append("")
 
     lines.append("----- Detailed (per stock) -----")
     for r in sorted_results[:80]:
-        lines.extend(_detailed_block(r))
+        lines.extend(_detailed(r))
         lines.append("")
     lines.append("")
 
     # ========== Early candidates (before extension) ==========
     # Same scan results; filter by thresholds, sort by grade (A+ then A then B) then composite score
-    def _grade_sort_key(g: str) -> int:
-        if g == "A+": return 0
-        if g == "A": return 1
-        if g == "B": return 2
-        return 3
-
-    early = []
-    for r in eligible:
-        if r.get("grade") not in ("A+", "A", "B"):
-            continue
-        trend_s = _safe_float(r.get("trend_score"), default=0)
-        rs_pct = _safe_float((r.get("relative_strength") or {}).get("rs_percentile"), default=0)
-        dist = _safe_float((r.get("breakout") or {}).get("distance_to_pivot_pct"), default=-999)
-        if not (EARLY_TREND_SCORE_MIN <= trend_s <= EARLY_TREND_SCORE_MAX):
-            continue
-        if not (EARLY_RS_PERCENTILE_MIN <= rs_pct <= EARLY_RS_PERCENTILE_MAX):
-            continue
-        if not (EARLY_DIST_TO_PIVOT_MIN_PCT <= dist <= EARLY_DIST_TO_PIVOT_MAX_PCT):
-            continue
-        early.append(r)
-    early_sorted = sorted(
-        early,
+    # Only the top EARLY_MAX_ROWS are shown: select them with a bounded heap instead of sorting every match
+    early_top = heapq.nsmallest(
+        EARLY_MAX_ROWS,
+        (r for r in eligible if _is_early_candidate(r)),
         key=lambda x: (
-            _grade_sort_key(x.get("grade") or ""),
+            _GRADE_SORT_ORDER.get(x.get("grade") or "", 3),
             -_safe_float(x.get("composite_score"), default=0),
             -_safe_float((x.get("breakout") or {}).get("distance_to_pivot_pct")),
             x.get("ticker") or "",
@@ -461,7 +499,7 @@ def generate_user_friendly_report(
     header_early = "| Rank | Ticker | Grade | Score | Trend | RS %ile | Dist to Pivot | Base Type | Note |"
     lines.append(header_early)
     lines.append("|" + "---|" * 9)
-    for i, r in enumerate(early_sorted[:EARLY_MAX_ROWS], 1):
+    for i, r in enumerate(early_top, 1):
         ticker = r.get("ticker", "?")
         grade = r.get("grade", "?")
         score = _safe_float(r.get("composite_score"), round_to=1)
@@ -470,15 +508,15 @@ def generate_user_friendly_report(
         rs_str = f"{_safe_float(rs_pct_val, round_to=1)}" if rs_pct_val is not None else "—"
         dist = _safe_float((r.get("breakout") or {}).get("distance_to_pivot_pct"), round_to=1)
         base_type = (r.get("base") or {}).get("type", "—")
-        note_str = _important_note_short(r)
+        note_str = _note(r)
         lines.append(f"| {i} | {ticker} | {grade} | {score} | {trend_s} | {rs_str} | {dist} | {base_type} | {note_str} |")
     lines.append("")
-    if not early_sorted:
+    if not early_top:
         lines.append("  (none match the early thresholds this run)")
     else:
         lines.append("----- Early candidates detailed (per stock) -----")
-        for r in early_sorted[:EARLY_MAX_ROWS]:
-            lines.extend(_detailed_block(r))
+        for r in early_top:
+            lines.extend(_detailed(r))
             lines.append("")
     lines.append("")
 
@@ -538,26 +576,27 @@ def export_scan_summary_to_csv(scan_results: List[Dict], filepath: Optional[Path
         risk = r.get("risk") or {}
         rs = r.get("relative_strength") or {}
         pr = r.get("power_rank")
-        rows.append({
-            "ticker": r.get("ticker", ""),
-            "grade": r.get("grade", ""),
-            "composite_score": _safe_float(r.get("composite_score"), round_to=2),
-            "base_type": base.get("type", ""),
-            "depth_pct": _safe_float(base.get("depth_pct"), round_to=2),
-            "pivot_source": (r.get("breakout") or {}).get("pivot_source", ""),
-            "rs_percentile": _safe_float(rs.get("rs_percentile"), round_to=2) if rs.get("rs_percentile") is not None else "",
-            "power_rank": _safe_float(pr, round_to=2) if pr is not None else "",
-            "distance_to_pivot_pct": _safe_float(br.get("distance_to_pivot_pct"), round_to=2),
-            "reward_to_risk": _safe_float(risk.get("reward_to_risk"), round_to=2) if risk.get("reward_to_risk") is not None else "",
-            "stop_price": _safe_float(risk.get("stop_price"), round_to=2) if risk.get("stop_price") is not None else "",
-        })
-
-    import csv
-    with open(filepath, "w", newline="", encoding="utf-8") as f:
-        if not rows:
-            f.write("ticker,grade,composite_score,base_type,depth_pct,pivot_source,rs_percentile,power_rank,distance_to_pivot_pct,reward_to_risk,stop_price\n")
-        else:
-            w = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
-            w.writeheader()
-            w.writerows(rows)
+        rows.append((
+            r.get("ticker", ""),
+            r.get("grade", ""),
+            _safe_float(r.get("composite_score"), round_to=2),
+            base.get("type", ""),
+            _safe_float(base.get("depth_pct"), round_to=2),
+            br.get("pivot_source", ""),
+            _safe_float(rs.get("rs_percentile"), round_to=2) if rs.get("rs_percentile") is not None else "",
+            _safe_float(pr, round_to=2) if pr is not None else "",
+            _safe_float(br.get("distance_to_pivot_pct"), round_to=2),
+            _safe_float(risk.get("reward_to_risk"), round_to=2) if risk.get("reward_to_risk") is not None else "",
+            _safe_float(risk.get("stop_price"), round_to=2) if risk.get("stop_price") is not None else "",
+        ))
+
+    # Rows are plain tuples in _CSV_COLUMNS order: one csv.writer pass, one atomic file write
+    buf = io.StringIO()
+    if not rows:
+        buf.write(",".join(_CSV_COLUMNS) + "\n")
+    else:
+        w = csv.writer(buf)
+        w.writerow(_CSV_COLUMNS)
+        w.writerows(rows)
+    write_text_atomic(filepath, buf.getvalue())
     return str(filepath)
@@ -49,6 +49,14 @@ from config import (
 
 logger = get_logger(__name__)
 
+# Composite-score grade bands, highest first; scanned by _grade_from_composite
+_GRADE_BANDS = (
+    (GRADE_A_PLUS_MIN_SCORE, "A+"),
+    (GRADE_A_MIN_SCORE, "A"),
+    (GRADE_B_MIN_SCORE, "B"),
+    (GRADE_C_MIN_SCORE, "C"),
+)
+
 
 def _percentile_rank(value: float, universe_values: List[float]) -> float:
     """Compute percentile rank of value in universe (0-100). Strict: (count strictly less) / n * 100."""
@@ -409,14 +417,9 @@ class MinerviniScannerV2(MinerviniScanner):
 
     def _grade_from_composite(self, composite_score: float) -> str:
         """≥85 A+, 75-84 A, 65-74 B, 55-64 C, <55 REJECT."""
-        if composite_score >= GRADE_A_PLUS_MIN_SCORE:
-            return "A+"
-        if composite_score >= GRADE_A_MIN_SCORE:
-            return "A"
-        if composite_score >= GRADE_B_MIN_SCORE:
-            return "B"
-        if composite_score >= GRADE_C_MIN_SCORE:
-            return "C"
+        for min_score, grade in _GRADE_BANDS:
+            if composite_score >= min_score:
+                return grade
         return "REJECT"
 
     def _build_risk_section(
@@ -635,24 +638,25 @@ class MinerviniScannerV2(MinerviniScanner):
             "reject_reason": reason,
         }
 
-    def scan_universe(
-        self,
-        tickers: List[str],
-        benchmark_overrides: Optional[Dict[str, str]] = None,
-    ) -> List[Dict]:
-        """
-        Two-phase: (1) collect 3M returns for all tickers, compute percentile; (2) scan each stock with rs_percentile.
-        benchmark_overrides: optional dict ticker -> benchmark
-        """
-        # Phase 1: 3M returns for universe
+    def universe_rs_3m(self, tickers: List[str]) -> Tuple[Dict[str, float], Dict[str, float]]:
+        """3M return per ticker and its percentile rank within the universe (phase 1 of scan_universe)."""
         returns_3m: Dict[str, float] = {}
+        # Providers that expose raw arrays (cached V2 provider) skip DataFrame construction here
+        get_raw = self.data_provider.get_raw_ohlcv if hasattr(type(self.data_provider), "get_raw_ohlcv") else None
         for t in tickers:
             try:
-                hist = self.data_provider.get_historical_data(t, period="1y", interval="1d")
-                if hist is None or len(hist) < RS_3M_LOOKBACK_DAYS:
+                raw = get_raw(t) if get_raw is not None else None
+                if raw is not None:
+                    close = raw[3]
+                else:
+                    hist = self.data_provider.get_historical_data(t, period="1y", interval="1d")
+                    if hist is None:
+                        continue
+                    close = hist["Close"].to_numpy()
+                if len(close) < RS_3M_LOOKBACK_DAYS:
                     continue
-                start_price = hist["Close"].iloc[-RS_3M_LOOKBACK_DAYS]
-                end_price = hist["Close"].iloc[-1]
+                start_price = close[-RS_3M_LOOKBACK_DAYS]
+                end_price = close[-1]
                 if start_price and start_price > 0:
                     returns_3m[t] = (end_price / float(start_price) - 1.0) * 100.0
             except Exception as e:
@@ -661,6 +665,19 @@ class MinerviniScannerV2(MinerviniScanner):
         percentiles: Dict[str, float] = {}
         for t, r in returns_3m.items():
             percentiles[t] = _percentile_rank(r, values)
+        return returns_3m, percentiles
+
+    def scan_universe(
+        self,
+        tickers: List[str],
+        benchmark_overrides: Optional[Dict[str, str]] = None,
+    ) -> List[Dict]:
+        """
+        Two-phase: (1) collect 3M returns for all tickers, compute percentile; (2) scan each stock with rs_percentile.
+        benchmark_overrides: optional dict ticker -> benchmark
+        """
+        # Phase 1: 3M returns for universe
+        returns_3m, percentiles = self.universe_rs_3m(tickers)
 
         # Phase 2: scan each with rs_percentile and rs_3m
         results = []
@@ -2,23 +2,48 @@
 Shared OpenAI API helpers for ChatGPT validation and position scripts.
 Used by: 06_chatgpt_existing_positions.py, 07_chatgpt_new_positions.py.
 """
+import hashlib
+import importlib.util
+import math
 import os
+import random
+import threading
 import time
-from typing import Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
 
-from openai import OpenAI
 from logger_config import get_logger
+from file_utils import dumps_json, loads_json, read_json, write_bytes_atomic
 from config import (
     OPENAI_CHATGPT_MODEL,
     OPENAI_CHATGPT_MAX_COMPLETION_TOKENS,
     OPENAI_API_TIMEOUT,
     OPENAI_CHATGPT_RETRY_ATTEMPTS,
     OPENAI_CHATGPT_RETRY_BASE_SECONDS,
+    OPENAI_CHATGPT_RETRY_MAX_SECONDS,
+    OPENAI_CHATGPT_CONCURRENCY,
+    OPENAI_CHATGPT_CONTEXT_TOKENS,
+    OPENAI_CHATGPT_TOKENS_PER_SECOND,
+    OPENAI_CHATGPT_USE_CACHE,
+    OPENAI_CHATGPT_CACHE_DIR,
+    OPENAI_CHATGPT_CACHE_TTL_HOURS,
+    OPENAI_CHATGPT_RPM,
+    OPENAI_CHATGPT_TPM,
+    OPENAI_BATCH_POLL_SECONDS,
+    OPENAI_HTTP_MAX_CONNECTIONS,
 )
 
 logger = get_logger(__name__)
 
 
+def _retryable_errors() -> tuple:
+    """Transient OpenAI errors worth retrying; anything else (bad request, auth) fails immediately."""
+    from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+    return (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
+
+
 def require_openai_api_key(api_key_from_args: Optional[str] = None) -> str:
     """
     Resolve OpenAI API key from argument or environment.
@@ -33,6 +58,275 @@ def require_openai_api_key(api_key_from_args: Optional[str] = None) -> str:
     return key
 
 
+@lru_cache(maxsize=4)
+def _token_encoder(model: str):
+    """
+    tiktoken encoder for model (cached, so a failure is logged once); None when tiktoken is not
+    installed or its encoding cannot be loaded (e.g. BPE file download blocked offline).
+    """
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            # Newer models may be unknown to the installed tiktoken; o200k_base is the current family
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        logger.warning("tiktoken encoding unavailable for %s (%s); estimating ~4 chars per token", model, e)
+        return None
+
+
+def estimate_tokens(text: str, model: Optional[str] = None) -> int:
+    """Token count for text (tiktoken when installed, else ~4 chars per token)."""
+    if not text:
+        return 0
+    encoder = _token_encoder(model or OPENAI_CHATGPT_MODEL)
+    if encoder is not None:
+        return len(encoder.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / 4)
+
+
+def request_timeout(prompt_tokens: int, max_tokens: int) -> int:
+    """Seconds to allow for a request of this size: OPENAI_API_TIMEOUT, or longer for big prompts/completions."""
+    return max(OPENAI_API_TIMEOUT, math.ceil((prompt_tokens + max_tokens) / OPENAI_CHATGPT_TOKENS_PER_SECOND))
+
+
+def _retry_after_seconds(exc: Exception) -> Optional[float]:
+    """Server retry hint from retry-after-ms / retry-after response headers, if present."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        ms = headers.get("retry-after-ms")
+        if ms is not None:
+            return float(ms) / 1000.0
+        sec = headers.get("retry-after")
+        if sec is not None:
+            return float(sec)
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+def _backoff_seconds(attempt: int, exc: Exception) -> float:
+    """Wait before retry `attempt` (0-based): Retry-After if sent, else exponential backoff with jitter."""
+    hint = _retry_after_seconds(exc)
+    if hint is not None and hint >= 0:
+        return min(hint, OPENAI_CHATGPT_RETRY_MAX_SECONDS)
+    base = OPENAI_CHATGPT_RETRY_BASE_SECONDS
+    return min(OPENAI_CHATGPT_RETRY_MAX_SECONDS, base * (2 ** attempt)) + random.uniform(0, base / 2)
+
+
+class RateLimiter:
+    """
+    Token buckets for requests and tokens per minute, shared by all threads: each request waits
+    until both have capacity instead of being sent and answered with a 429. A limit of 0 disables
+    that bucket; a request larger than the whole token bucket waits for a full bucket.
+    """
+
+    def __init__(self, rpm: int, tpm: int):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = float(rpm)
+        self._tokens = float(tpm)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        if self.rpm > 0:
+            self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60.0)
+        if self.tpm > 0:
+            self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60.0)
+
+    def acquire(self, tokens: int) -> float:
+        """Block until one request and `tokens` tokens are available and take them; returns seconds waited."""
+        if self.rpm <= 0 and self.tpm <= 0:
+            return 0.0
+        tokens = min(tokens, self.tpm) if self.tpm > 0 else 0
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                wait = 0.0
+                if self.rpm > 0 and self._requests < 1:
+                    wait = (1 - self._requests) * 60.0 / self.rpm
+                if self.tpm > 0 and self._tokens < tokens:
+                    wait = max(wait, (tokens - self._tokens) * 60.0 / self.tpm)
+                if wait <= 0:
+                    if self.rpm > 0:
+                        self._requests -= 1
+                    if self.tpm > 0:
+                        self._tokens -= tokens
+                    return waited
+            time.sleep(wait)
+            waited += wait
+
+
+_rate_limiter = RateLimiter(OPENAI_CHATGPT_RPM, OPENAI_CHATGPT_TPM)
+
+
+def set_rate_limits(rpm: Optional[int] = None, tpm: Optional[int] = None) -> None:
+    """Replace the shared limiter (06/07 --rpm/--tpm); None keeps the OPENAI_CHATGPT_RPM/TPM default."""
+    global _rate_limiter
+    _rate_limiter = RateLimiter(
+        OPENAI_CHATGPT_RPM if rpm is None else rpm,
+        OPENAI_CHATGPT_TPM if tpm is None else tpm,
+    )
+
+
+_clients: Dict[str, Any] = {}
+_clients_lock = threading.Lock()
+
+
+def _http_client():
+    """
+    httpx client for the OpenAI SDK: the SDK's DefaultHttpxClient (keeps its own defaults, e.g.
+    redirects) with a connection pool sized for the concurrent workers, over HTTP/2 when the h2
+    package is installed (requests multiplex on one connection instead of queueing).
+    None when httpx or DefaultHttpxClient is not available; the SDK then builds its default client.
+    """
+    try:
+        import httpx
+        from openai import DefaultHttpxClient
+    except ImportError:
+        return None
+    http2 = importlib.util.find_spec("h2") is not None
+    limits = httpx.Limits(
+        max_connections=OPENAI_HTTP_MAX_CONNECTIONS, max_keepalive_connections=OPENAI_HTTP_MAX_CONNECTIONS
+    )
+    logger.debug("OpenAI HTTP client: %s, pool of %d", "HTTP/2" if http2 else "HTTP/1.1", OPENAI_HTTP_MAX_CONNECTIONS)
+    return DefaultHttpxClient(http2=http2, limits=limits, timeout=httpx.Timeout(OPENAI_API_TIMEOUT, connect=10.0))
+
+
+def _get_client(api_key: str):
+    """
+    Shared OpenAI client per API key, so every request, retry and worker thread reuses one
+    keep-alive connection pool instead of a new TLS handshake per call (the client is thread-safe;
+    timeouts are passed per request).
+    """
+    with _clients_lock:
+        client = _clients.get(api_key)
+        if client is None:
+            # Imported here so scripts that exit early (no API key, no input data) skip the openai import cost
+            from openai import OpenAI
+
+            http_client = _http_client()
+            if http_client is not None:
+                client = OpenAI(api_key=api_key, http_client=http_client)
+            else:
+                client = OpenAI(api_key=api_key)
+            _clients[api_key] = client
+        return client
+
+
+def _cache_path(model: str, prompt: str, system_content: Optional[str], max_tokens: int) -> Path:
+    """
+    Response cache file for this exact request (sha256 of model, max_tokens, system message and prompt).
+    max_tokens is part of the key: an answer cut off at a lower limit is not reused for a higher one.
+    """
+    key = hashlib.sha256("\0".join((model, str(max_tokens), system_content or "", prompt)).encode("utf-8")).hexdigest()
+    return OPENAI_CHATGPT_CACHE_DIR / f"{key}.json"
+
+
+def _read_cached_response(path: Path, ttl_hours: Optional[float] = None) -> Optional[Tuple[str, Optional[dict]]]:
+    """(content, usage) from a cache file, or None if missing/unreadable or older than ttl_hours (0 = no expiry)."""
+    if not path.exists():
+        return None
+    ttl_hours = OPENAI_CHATGPT_CACHE_TTL_HOURS if ttl_hours is None else ttl_hours
+    try:
+        entry = read_json(path)
+        if ttl_hours > 0 and time.time() - float(entry.get("ts") or 0) > ttl_hours * 3600:
+            return None
+        content = entry.get("content")
+        if content:
+            return (content, entry.get("usage"))
+    except (OSError, ValueError, AttributeError) as e:
+        logger.warning("Ignoring unreadable ChatGPT cache file %s: %s", path, e)
+    return None
+
+
+def clear_response_cache() -> int:
+    """Delete all saved ChatGPT responses (06/07 --cache-clear); returns the number of files removed."""
+    removed = 0
+    if OPENAI_CHATGPT_CACHE_DIR.is_dir():
+        for path in OPENAI_CHATGPT_CACHE_DIR.glob("*.json"):
+            path.unlink(missing_ok=True)
+            removed += 1
+    return removed
+
+
+def _write_cached_response(path: Path, content: str, usage: Optional[dict]) -> None:
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        write_bytes_atomic(path, dumps_json({"content": content, "usage": usage, "ts": time.time()}))
+    except OSError as e:
+        logger.warning("Could not write ChatGPT cache file %s: %s", path, e)
+
+
+def _usage_dict(usage) -> Optional[dict]:
+    if not usage:
+        return None
+    return {
+        "prompt_tokens": getattr(usage, "prompt_tokens", None),
+        "completion_tokens": getattr(usage, "completion_tokens", None),
+        "total_tokens": getattr(usage, "total_tokens", None),
+    }
+
+
+# Passed to on_delta before a streamed response is retried from the start, so text already shown is not silently repeated
+STREAM_RESTART_MARKER = "\n\n[connection interrupted - restarting the response]\n\n"
+
+
+def _stream_completion(client, on_delta: Callable[[str], None], **params) -> Tuple[Optional[str], Optional[dict]]:
+    """Streamed chat completion: on_delta(text) per chunk as it arrives; returns the joined content and usage."""
+    parts: List[str] = []
+    usage = None
+    stream = client.chat.completions.create(stream=True, stream_options={"include_usage": True}, **params)
+    for chunk in stream:
+        if chunk.usage:
+            usage = chunk.usage
+        if not chunk.choices:
+            continue
+        text = chunk.choices[0].delta.content
+        if text:
+            parts.append(text)
+            on_delta(text)
+    return ("".join(parts) or None, _usage_dict(usage))
+
+
+def _completion_budget(
+    prompt: str, system_content: Optional[str], model: str, max_tokens: int
+) -> Tuple[int, Optional[int]]:
+    """
+    (estimated prompt tokens, completion budget clamped so prompt + completion fit the context window).
+    The budget is None when the prompt alone does not fit (the request should not be sent).
+    """
+    prompt_tokens = estimate_tokens(prompt, model) + estimate_tokens(system_content or "", model)
+    available = OPENAI_CHATGPT_CONTEXT_TOKENS - prompt_tokens
+    if available <= 0:
+        logger.error("Prompt (~%d tokens) exceeds the context window (%d); not sent", prompt_tokens, OPENAI_CHATGPT_CONTEXT_TOKENS)
+        return (prompt_tokens, None)
+    if max_tokens > available:
+        logger.warning("Prompt ~%d tokens: completion budget reduced from %d to %d", prompt_tokens, max_tokens, available)
+        max_tokens = available
+    return (prompt_tokens, max_tokens)
+
+
+def _chat_messages(prompt: str, system_content: Optional[str]) -> List[dict]:
+    messages = []
+    if system_content:
+        messages.append({"role": "system", "content": system_content})
+    messages.append({"role": "user", "content": prompt})
+    return messages
+
+
 def send_to_chatgpt(
     prompt: str,
     api_key: str,
@@ -41,47 +335,239 @@ def send_to_chatgpt(
     max_tokens: Optional[int] = None,
     system_content: Optional[str] = None,
     timeout: Optional[int] = None,
+    use_cache: Optional[bool] = None,
+    cache_ttl_hours: Optional[float] = None,
+    on_delta: Optional[Callable[[str], None]] = None,
 ) -> Tuple[Optional[str], Optional[dict]]:
     """
     Send a single prompt to OpenAI Chat Completions API with retries.
     Returns (content, usage). usage may have prompt_tokens, completion_tokens, total_tokens.
     On failure returns (None, None).
+    With use_cache (default OPENAI_CHATGPT_USE_CACHE) a byte-identical earlier request is answered
+    from OPENAI_CHATGPT_CACHE_DIR without calling the API, unless it is older than cache_ttl_hours
+    (default OPENAI_CHATGPT_CACHE_TTL_HOURS); successful responses are saved there.
+    timeout defaults to request_timeout() for the estimated prompt tokens plus the completion budget.
+    Each attempt first waits on the shared RPM/TPM limiter (see set_rate_limits).
+    With on_delta the response is streamed and on_delta(text) is called for each chunk as it
+    arrives (a cached response is passed in one call); the full content is still returned.
+    If a stream fails after some text was passed on and is retried, on_delta first receives
+    STREAM_RESTART_MARKER; the returned content is the retried response only.
     """
     model = model or OPENAI_CHATGPT_MODEL
     max_tokens = max_tokens if max_tokens is not None else OPENAI_CHATGPT_MAX_COMPLETION_TOKENS
-    timeout = timeout or OPENAI_API_TIMEOUT
-    client = OpenAI(api_key=api_key)
+    use_cache = OPENAI_CHATGPT_USE_CACHE if use_cache is None else use_cache
 
-    messages = []
-    if system_content:
-        messages.append({"role": "system", "content": system_content})
-    messages.append({"role": "user", "content": prompt})
+    cache_path = _cache_path(model, prompt, system_content, max_tokens) if use_cache else None
+    if cache_path is not None:
+        cached = _read_cached_response(cache_path, cache_ttl_hours)
+        if cached is not None:
+            logger.info("ChatGPT response served from cache: %s", cache_path.name)
+            if on_delta:
+                on_delta(cached[0])
+            return cached
+
+    prompt_tokens, max_tokens = _completion_budget(prompt, system_content, model, max_tokens)
+    if max_tokens is None:
+        return (None, None)
+    # Default timeout scales with the request size (a fixed 60 s cuts off long completions)
+    timeout = timeout or request_timeout(prompt_tokens, max_tokens)
+
+    client = _get_client(api_key)
+    retryable = _retryable_errors()
+    messages = _chat_messages(prompt, system_content)
+    streamed = [False]  # whether the current attempt has passed text to on_delta
+
+    def _delta(text: str) -> None:
+        streamed[0] = True
+        on_delta(text)
 
     for attempt in range(OPENAI_CHATGPT_RETRY_ATTEMPTS):
+        # Pace to the account's RPM/TPM up front (max_tokens counts toward TPM); 429s still back off below
+        waited = _rate_limiter.acquire(prompt_tokens + max_tokens)
+        if waited:
+            logger.info("Waited %.1f s for OpenAI rate limit capacity", waited)
         try:
             # gpt-5.x and newer require max_completion_tokens; older models use max_tokens
-            resp = client.chat.completions.create(
-                model=model,
-                messages=messages,
-                max_completion_tokens=max_tokens,
-                timeout=timeout,
-            )
-            choice = resp.choices[0] if resp.choices else None
-            content = choice.message.content if choice and choice.message else None
-            usage = None
-            if resp.usage:
-                usage = {
-                    "prompt_tokens": getattr(resp.usage, "prompt_tokens", None),
-                    "completion_tokens": getattr(resp.usage, "completion_tokens", None),
-                    "total_tokens": getattr(resp.usage, "total_tokens", None),
-                }
+            params = dict(model=model, messages=messages, max_completion_tokens=max_tokens, timeout=timeout)
+            if on_delta:
+                content, usage = _stream_completion(client, _delta, **params)
+            else:
+                resp = client.chat.completions.create(**params)
+                choice = resp.choices[0] if resp.choices else None
+                content = choice.message.content if choice and choice.message else None
+                usage = _usage_dict(resp.usage)
+            if cache_path is not None and content:
+                _write_cached_response(cache_path, content, usage)
             return (content, usage)
-        except Exception as e:
-            wait = OPENAI_CHATGPT_RETRY_BASE_SECONDS * (attempt + 1)
+        except retryable as e:
             if attempt < OPENAI_CHATGPT_RETRY_ATTEMPTS - 1:
-                logger.warning("OpenAI request failed (%s), retrying in %s s: %s", attempt + 1, wait, e)
+                wait = _backoff_seconds(attempt, e)
+                logger.warning("OpenAI request failed (%s), retrying in %.1f s: %s", attempt + 1, wait, e)
                 time.sleep(wait)
+                if streamed[0]:
+                    on_delta(STREAM_RESTART_MARKER)
+                    streamed[0] = False
             else:
                 logger.error("OpenAI request failed after %s attempts: %s", OPENAI_CHATGPT_RETRY_ATTEMPTS, e)
                 return (None, None)
+        except Exception as e:
+            logger.error("OpenAI request failed (not retried): %s", e)
+            return (None, None)
     return (None, None)
+
+
+def _group_prompts(prompts: Sequence[str]) -> Dict[str, List[int]]:
+    """Unique prompt -> indexes where it occurs (first-occurrence order), so duplicates are sent once."""
+    groups: Dict[str, List[int]] = {}
+    for i, prompt in enumerate(prompts):
+        groups.setdefault(prompt, []).append(i)
+    return groups
+
+
+def send_many(
+    prompts: Sequence[str],
+    api_key: str,
+    *,
+    max_workers: Optional[int] = None,
+    on_done: Optional[Callable[[int, Tuple[Optional[str], Optional[dict]]], None]] = None,
+    **kwargs,
+) -> List[Tuple[Optional[str], Optional[dict]]]:
+    """
+    Send independent prompts concurrently (thread pool; requests are network-bound).
+    Returns one (content, usage) per prompt, in prompt order. Failed prompts yield (None, None).
+    on_done(index, result) is called as each request finishes (e.g. for progress output).
+    Identical prompts are sent once and the response is shared by every index that asked for it.
+    kwargs are passed through to send_to_chatgpt (model, max_tokens, system_content, timeout, use_cache,
+    cache_ttl_hours).
+    """
+    results: List[Tuple[Optional[str], Optional[dict]]] = [(None, None)] * len(prompts)
+    if not prompts:
+        return results
+    groups = _group_prompts(prompts)
+    workers = max(1, min(max_workers or OPENAI_CHATGPT_CONCURRENCY, len(groups)))
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        futures = {ex.submit(send_to_chatgpt, p, api_key, **kwargs): idxs for p, idxs in groups.items()}
+        for future in as_completed(futures):
+            idxs = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.error("OpenAI request %d failed: %s", idxs[0], e)
+                result = (None, None)
+            for i in idxs:
+                results[i] = result
+                if on_done:
+                    on_done(i, result)
+    return results
+
+
+_BATCH_FINAL_STATES = ("completed", "failed", "expired", "cancelled")
+
+
+def _parse_batch_output(text: str) -> dict:
+    """
+    custom_id -> (content, usage) for each successful line of a Batch API output file.
+    Malformed lines are logged and skipped, so one bad line does not lose the other answers.
+    """
+    out = {}
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            row = loads_json(line)
+            response = row.get("response") or {}
+            if row.get("error") or response.get("status_code") != 200:
+                logger.error("Batch request %s failed: %s", row.get("custom_id"), row.get("error") or response.get("body"))
+                continue
+            body = response.get("body") or {}
+            choices = body.get("choices") or []
+            content = ((choices[0].get("message") or {}).get("content")) if choices else None
+            usage = body.get("usage")
+            if usage:
+                usage = {k: usage.get(k) for k in ("prompt_tokens", "completion_tokens", "total_tokens")}
+        except Exception as e:
+            logger.error("Skipping unreadable batch output line (%s): %.200s", e, line)
+            continue
+        out[row.get("custom_id")] = (content, usage)
+    return out
+
+
+def send_batch(
+    prompts: Sequence[str],
+    api_key: str,
+    *,
+    model: Optional[str] = None,
+    max_tokens: Optional[int] = None,
+    system_content: Optional[str] = None,
+    use_cache: Optional[bool] = None,
+    cache_ttl_hours: Optional[float] = None,
+    poll_seconds: Optional[int] = None,
+) -> List[Tuple[Optional[str], Optional[dict]]]:
+    """
+    Send independent prompts as one OpenAI Batch API job (about half the per-token price, no
+    per-request latency; OpenAI completes it within the 24h window). Blocks, polling every
+    poll_seconds (default OPENAI_BATCH_POLL_SECONDS), until the job finishes.
+    Returns one (content, usage) per prompt, in prompt order, like send_many; failed, expired or
+    unsent prompts yield (None, None). Identical prompts are submitted once. Cached responses are
+    reused and new ones saved (see use_cache and cache_ttl_hours in send_to_chatgpt).
+    """
+    model = model or OPENAI_CHATGPT_MODEL
+    max_tokens = max_tokens if max_tokens is not None else OPENAI_CHATGPT_MAX_COMPLETION_TOKENS
+    use_cache = OPENAI_CHATGPT_USE_CACHE if use_cache is None else use_cache
+    poll_seconds = poll_seconds or OPENAI_BATCH_POLL_SECONDS
+
+    results: List[Tuple[Optional[str], Optional[dict]]] = [(None, None)] * len(prompts)
+    groups = _group_prompts(prompts)
+    lines: List[bytes] = []
+    for prompt, idxs in groups.items():
+        i = idxs[0]
+        if use_cache:
+            cached = _read_cached_response(_cache_path(model, prompt, system_content, max_tokens), cache_ttl_hours)
+            if cached is not None:
+                for j in idxs:
+                    results[j] = cached
+                continue
+        _, budget = _completion_budget(prompt, system_content, model, max_tokens)
+        if budget is None:
+            continue
+        body = {"model": model, "messages": _chat_messages(prompt, system_content), "max_completion_tokens": budget}
+        lines.append(dumps_json({"custom_id": str(i), "method": "POST", "url": "/v1/chat/completions", "body": body}))
+    if not lines:
+        return results
+
+    client = _get_client(api_key)
+    try:
+        batch_file = client.files.create(file=("batch_input.jsonl", b"\n".join(lines)), purpose="batch")
+        batch = client.batches.create(
+            input_file_id=batch_file.id, endpoint="/v1/chat/completions", completion_window="24h"
+        )
+        logger.info("Submitted OpenAI batch %s (%d requests)", batch.id, len(lines))
+        while batch.status not in _BATCH_FINAL_STATES:
+            time.sleep(poll_seconds)
+            batch = client.batches.retrieve(batch.id)
+            counts = batch.request_counts
+            if counts is not None:
+                logger.info("Batch %s %s: %s/%s done", batch.id, batch.status, counts.completed, counts.total)
+        if batch.status != "completed":
+            logger.error("OpenAI batch %s ended with status %s", batch.id, batch.status)
+        # An expired or cancelled batch still has output for the requests it finished
+        if not batch.output_file_id:
+            return results
+        answers = _parse_batch_output(client.files.content(batch.output_file_id).text)
+    except Exception as e:
+        logger.error("OpenAI batch request failed: %s", e)
+        return results
+
+    for custom_id, (content, usage) in answers.items():
+        try:
+            i = int(custom_id)
+        except (TypeError, ValueError):
+            i = -1
+        if not 0 <= i < len(prompts):
+            logger.error("Skipping batch answer with unexpected custom_id %r", custom_id)
+            continue
+        for j in groups[prompts[i]]:
+            results[j] = (content, usage)
+        if use_cache and content:
+            _write_cached_response(_cache_path(model, prompts[i], system_content, max_tokens), content, usage)
+    return results
@@ -4,11 +4,11 @@ Uses risk per share (buy_price - stop_loss) so that total risk = account_size *
 Run after scan; can read from latest scan results or pass buy/stop manually.
 """
 import argparse
-import json
 from pathlib import Path
 from typing import Dict, List, Optional
 
 from config import REPORTS_DIR, SCAN_RESULTS_LATEST
+from file_utils import read_json
 
 
 def position_size_from_risk(
@@ -58,8 +58,7 @@ def main():
         if not path.exists():
             print(f"Scan results not found at {path}. Run the pipeline scan step first (e.g. run_pipeline_v2.py).")
             return
-        with open(path, encoding="utf-8") as f:
-            results = json.load(f)
+        results = read_json(path)
         tickers = [r for r in results if "error" not in r and r.get("buy_sell_prices", {}).get("pivot_price") is not None]
         if args.ticker:
             tickers = [r for r in tickers if r.get("ticker") == args.ticker]
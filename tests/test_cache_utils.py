@@ -3,7 +3,17 @@ import json
 import pytest
 from pathlib import Path
 
-from cache_utils import load_cached_data, save_cached_data
+import pandas as pd
+
+from cache_utils import (
+    load_cached_data,
+    save_cached_data,
+    hist_columns,
+    hist_to_cache_dict,
+    intern_cache_strings,
+    load_pipeline_cache,
+    load_pipeline_positions,
+)
 
 
 def test_load_cached_data_missing_returns_none(monkeypatch, tmp_path):
@@ -30,6 +40,24 @@ def test_load_cached_data_valid_returns_dict(monkeypatch, tmp_path):
     assert result == data
 
 
+def test_load_pipeline_cache_missing_or_invalid_returns_empty(monkeypatch, tmp_path):
+    """Pipeline cache loader returns empty stocks/metadata when the file is missing or not a dict."""
+    cache_file = tmp_path / "pipeline.json"
+    monkeypatch.setattr("cache_utils.NEW_PIPELINE_CACHE", cache_file)
+    assert load_pipeline_cache() == {"stocks": {}, "metadata": {}}
+    cache_file.write_text("[1, 2]", encoding="utf-8")
+    assert load_pipeline_cache() == {"stocks": {}, "metadata": {}}
+
+
+def test_load_pipeline_positions_returns_list(monkeypatch, tmp_path):
+    """Positions loader returns the saved positions list, [] when the file is missing."""
+    positions_file = tmp_path / "positions.json"
+    monkeypatch.setattr("cache_utils.NEW_PIPELINE_POSITIONS", positions_file)
+    assert load_pipeline_positions() == []
+    positions_file.write_text(json.dumps({"positions": [{"ticker": "AAPL"}]}), encoding="utf-8")
+    assert load_pipeline_positions() == [{"ticker": "AAPL"}]
+
+
 def test_save_cached_data_creates_file(monkeypatch, tmp_path):
     """save_cached_data writes JSON to CACHE_FILE."""
     cache_file = tmp_path / "out.json"
@@ -39,3 +67,60 @@ def test_save_cached_data_creates_file(monkeypatch, tmp_path):
     loaded = json.loads(cache_file.read_text(encoding="utf-8"))
     assert loaded["stocks"]["AAPL"] == {}
     assert "metadata" in loaded
+
+
+def test_save_cached_data_roundtrips_hist_columns(monkeypatch, tmp_path):
+    """Columns built by hist_to_cache_dict load back unchanged after save_cached_data."""
+    cache_file = tmp_path / "out.json"
+    monkeypatch.setattr("cache_utils.CACHE_FILE", cache_file)
+    idx = pd.date_range("2024-01-01", periods=3, tz="Europe/Berlin")
+    hist = pd.DataFrame({"Close": [1.5, 2.25, 3.0], "Volume": [100, 200, 300]}, index=idx)
+    entry = hist_to_cache_dict(hist)
+    save_cached_data({"stocks": {"RWE.DE": {"historical_data": entry}}, "metadata": {}})
+    assert load_cached_data()["stocks"]["RWE.DE"]["historical_data"] == entry
+
+
+def test_hist_to_cache_dict_matches_columns_shape():
+    """hist_to_cache_dict returns str index and column lists, unchanged without a rate."""
+    idx = pd.date_range("2024-01-01", periods=2)
+    hist = pd.DataFrame({"Open": [1.0, 2.0], "Close": [1.5, 2.5], "Volume": [100, 200]}, index=idx)
+    out = hist_to_cache_dict(hist)
+    assert out["index"] == [str(i) for i in idx]
+    assert out["data"] == {"Open": [1.0, 2.0], "Close": [1.5, 2.5], "Volume": [100, 200]}
+
+
+def test_hist_to_cache_dict_converts_prices_not_volume():
+    """With a rate, price columns are converted and rounded; Volume and input are untouched."""
+    hist = pd.DataFrame({"Open": [10.0], "Close": [20.0], "Volume": [100]})
+    out = hist_to_cache_dict(hist, 1.123456)
+    assert out["data"]["Open"] == [round(10.0 * 1.123456, 4)]
+    assert out["data"]["Close"] == [round(20.0 * 1.123456, 4)]
+    assert out["data"]["Volume"] == [100]
+    assert hist["Open"].iloc[0] == 10.0
+
+
+def test_hist_columns_converts_legacy_records_once():
+    """Record-style data (older cache files) becomes column lists, stored back; columns pass through."""
+    hist = {"index": ["d1", "d2"], "data": [{"Close": 1.0, "Volume": 5}, {"Close": 2.0}]}
+    cols = hist_columns(hist)
+    assert cols == {"Close": [1.0, 2.0], "Volume": [5, None]}
+    assert hist["data"] is cols
+    assert hist_columns(hist) is cols
+    assert hist_columns({"data": []}) == {}
+    assert hist_columns(None) == {}
+
+
+def test_intern_cache_strings_shares_repeated_values():
+    """After a JSON round trip, repeated index dates and metadata strings become one shared object."""
+    entry = {
+        "benchmark_index": "^GDAXI",
+        "stock_info": {"currency": "EUR"},
+        "historical_data": {"index": ["2024-01-02 00:00:00+01:00"], "data": [{"Close": 1.0}]},
+    }
+    stocks = json.loads(json.dumps({"SAP.DE": entry, "BMW.DE": entry}))
+    intern_cache_strings(stocks)
+    sap, bmw = stocks["SAP.DE"], stocks["BMW.DE"]
+    assert sap["historical_data"]["index"][0] is bmw["historical_data"]["index"][0]
+    assert sap["benchmark_index"] is bmw["benchmark_index"]
+    assert sap["stock_info"]["currency"] is bmw["stock_info"]["currency"]
+    assert sap == entry
@@ -6,6 +6,7 @@ from currency_utils import (
     usd_to_eur,
     get_eur_usd_rate,
     get_eur_usd_rate_with_date,
+    get_eur_usd_rate_with_date_cached,
     warn_if_eur_rate_unavailable,
     format_eur_if_available,
 )
@@ -38,6 +39,27 @@ class TestGetEurUsdRate:
         assert (rate is None and date is None) or (isinstance(rate, (int, float)) and (date is None or isinstance(date, str)))
 
 
+class TestGetEurUsdRateCached:
+    def test_fetches_once_per_day(self, monkeypatch, tmp_path):
+        monkeypatch.setattr("currency_utils.EUR_USD_RATE_CACHE_FILE", tmp_path / "rate.json")
+        fetch = MagicMock(return_value=(1.09, "2026-02-20"))
+        monkeypatch.setattr("currency_utils.get_eur_usd_rate_with_date", fetch)
+        assert get_eur_usd_rate_with_date_cached() == (1.09, "2026-02-20")
+        assert get_eur_usd_rate_with_date_cached() == (1.09, "2026-02-20")
+        assert fetch.call_count == 1
+
+    def test_stale_or_failed_fetch_is_not_reused(self, monkeypatch, tmp_path):
+        import json
+        path = tmp_path / "rate.json"
+        path.write_text(json.dumps({"rate": 1.05, "date": "2020-01-01", "fetched_on": "2020-01-02"}))
+        monkeypatch.setattr("currency_utils.EUR_USD_RATE_CACHE_FILE", path)
+        fetch = MagicMock(return_value=(None, None))
+        monkeypatch.setattr("currency_utils.get_eur_usd_rate_with_date", fetch)
+        assert get_eur_usd_rate_with_date_cached() == (None, None)
+        assert get_eur_usd_rate_with_date_cached() == (None, None)
+        assert fetch.call_count == 2
+
+
 class TestFormatEurIfAvailable:
     def test_returns_formatted_eur_when_rate_ok(self):
         assert "100.00 EUR" in format_eur_if_available(108.0, 1.08)
@@ -0,0 +1,205 @@
+"""Tests for file_utils module."""
+import json
+import math
+import os
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import file_utils
+from file_utils import (
+    PartialLinesWriter,
+    dumps_json,
+    json_default,
+    load_with_sidecar,
+    loads_json,
+    outputs_up_to_date,
+    read_json,
+    read_json_cached,
+    write_lines_atomic,
+    write_text_atomic,
+    write_text_if_changed,
+)
+
+
+def test_read_json_roundtrip(tmp_path):
+    """read_json returns the same object stdlib json wrote."""
+    data = {"stocks": {"AAPL": {"data": [{"Close": 1.5, "Volume": 100}]}}, "name": "Zürich"}
+    path = tmp_path / "data.json"
+    path.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
+    assert read_json(path) == data
+
+
+def test_loads_json_accepts_nan_literals():
+    """NaN/Infinity written by stdlib json.dump still parse (orjson rejects them)."""
+    out = loads_json(json.dumps({"Close": float("nan"), "High": 2.0}))
+    assert math.isnan(out["Close"]) and out["High"] == 2.0
+
+
+def test_loads_json_without_orjson(monkeypatch):
+    """Stdlib fallback is used when orjson is not installed."""
+    monkeypatch.setattr(file_utils, "ORJSON_AVAILABLE", False)
+    assert loads_json(b'{"a": [1, 2]}') == {"a": [1, 2]}
+
+
+def test_read_json_invalid_raises(tmp_path):
+    """Invalid JSON raises ValueError (callers handle it like json.load errors)."""
+    path = tmp_path / "bad.json"
+    path.write_text("not json {", encoding="utf-8")
+    with pytest.raises(ValueError):
+        read_json(path)
+
+
+def test_read_json_nan_file_and_empty_file(tmp_path):
+    """Files with NaN literals parse via the fallback; an empty file raises ValueError (not an mmap error)."""
+    nan_path = tmp_path / "nan.json"
+    nan_path.write_text(json.dumps({"Close": float("nan"), "High": 2.0}), encoding="utf-8")
+    out = read_json(nan_path)
+    assert math.isnan(out["Close"]) and out["High"] == 2.0
+    empty = tmp_path / "empty.json"
+    empty.write_bytes(b"")
+    with pytest.raises(ValueError):
+        read_json(empty)
+
+
+def test_read_json_cached_uses_sidecar_until_file_changes(tmp_path, monkeypatch):
+    """The second read of an unchanged file comes from the .pkl sidecar; a rewritten file is parsed again."""
+    path = tmp_path / "cache.json"
+    path.write_text(json.dumps({"stocks": {"AAPL": [1.5, 2]}}), encoding="utf-8")
+    assert read_json_cached(path) == {"stocks": {"AAPL": [1.5, 2]}}
+    assert (tmp_path / "cache.json.pkl").exists()
+
+    parsed = []
+    monkeypatch.setattr(file_utils, "read_json", lambda p: parsed.append(p) or json.loads(Path(p).read_text()))
+    assert read_json_cached(path) == {"stocks": {"AAPL": [1.5, 2]}}
+    assert parsed == []
+    path.write_text(json.dumps({"stocks": {}}) + " " * 40, encoding="utf-8")
+    assert read_json_cached(path) == {"stocks": {}}
+    assert parsed == [path]
+
+
+def test_load_with_sidecar_skips_parse_for_unchanged_file(tmp_path):
+    """Any parser can use the sidecar: it runs once per file version."""
+    path = tmp_path / "watchlist.csv"
+    path.write_text("yahoo_symbol\nAAPL\n", encoding="utf-8")
+    calls = []
+
+    def parse(p):
+        calls.append(p)
+        return p.read_text(encoding="utf-8").split()
+
+    assert load_with_sidecar(path, parse) == ["yahoo_symbol", "AAPL"]
+    assert load_with_sidecar(path, parse) == ["yahoo_symbol", "AAPL"]
+    assert calls == [path]
+
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_dumps_json_matches_stdlib_layout(monkeypatch, use_orjson):
+    """Indented output has the json.dump(indent=2, ensure_ascii=False) layout with or without orjson."""
+    if use_orjson and not file_utils.ORJSON_AVAILABLE:
+        pytest.skip("orjson not installed")
+    monkeypatch.setattr(file_utils, "ORJSON_AVAILABLE", use_orjson)
+    data = [{"ticker": "SAP.DE", "grade": "A", "score": 81.25, "base": {"type": "flat", "ok": True}, "name": "Zürich"}]
+    expected = json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8")
+    assert dumps_json(data, indent=True) == expected
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_dumps_json_numpy_and_dates(monkeypatch, use_orjson):
+    """numpy scalars and datetimes serialize like the plain-Python equivalents (no sanitize pre-pass)."""
+    if use_orjson and not file_utils.ORJSON_AVAILABLE:
+        pytest.skip("orjson not installed")
+    monkeypatch.setattr(file_utils, "ORJSON_AVAILABLE", use_orjson)
+    data = {
+        "n": np.int64(3), "f": np.float32(0.5), "ok": np.bool_(True),
+        "at": pd.Timestamp("2024-01-02 09:30"), "run": datetime(2024, 1, 2),
+        "rows": [{"v": np.int32(7)}], "other": None,
+    }
+    plain = {
+        "n": 3, "f": 0.5, "ok": True, "at": "2024-01-02T09:30:00", "run": "2024-01-02T00:00:00",
+        "rows": [{"v": 7}], "other": None,
+    }
+    out = dumps_json(data, indent=True, default=json_default)
+    assert json.loads(out) == plain
+    assert out == json.dumps(plain, indent=2, ensure_ascii=False).encode("utf-8")
+
+
+def test_write_text_atomic_replaces_file(tmp_path):
+    """write_text_atomic overwrites the target and leaves no temp file behind."""
+    path = tmp_path / "report.txt"
+    path.write_text("old", encoding="utf-8")
+    write_text_atomic(path, "neu ≥ 1\n")
+    assert path.read_text(encoding="utf-8") == "neu ≥ 1\n"
+    assert [p.name for p in tmp_path.iterdir()] == ["report.txt"]
+
+
+def test_write_text_atomic_failure_keeps_original(tmp_path, monkeypatch):
+    """If the rename fails, the original file is untouched and the temp file removed."""
+    path = tmp_path / "report.txt"
+    path.write_text("old", encoding="utf-8")
+
+    def boom(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(file_utils.os, "replace", boom)
+    with pytest.raises(OSError):
+        write_text_atomic(path, "new")
+    assert path.read_text(encoding="utf-8") == "old"
+    assert [p.name for p in tmp_path.iterdir()] == ["report.txt"]
+
+
+def test_write_text_if_changed_skips_identical_content(tmp_path):
+    """Same content is not rewritten (mtime kept); new content or a missing file is written."""
+    path = tmp_path / "index.html"
+    assert write_text_if_changed(path, "<p>a</p>") is True
+    mtime = path.stat().st_mtime_ns
+    assert write_text_if_changed(path, "<p>a</p>") is False
+    assert path.stat().st_mtime_ns == mtime
+    assert write_text_if_changed(path, "<p>b</p>") is True
+    assert path.read_text(encoding="utf-8") == "<p>b</p>"
+
+
+def test_outputs_up_to_date_compares_mtimes(tmp_path):
+    """Fresh only when all outputs exist and are newer than every existing input."""
+    src, out = tmp_path / "scan.json", tmp_path / "prepared.json"
+    src.write_text("[]", encoding="utf-8")
+    assert outputs_up_to_date([out], [src]) is False
+    out.write_text("{}", encoding="utf-8")
+    os.utime(src, ns=(1_000_000_000, 1_000_000_000))
+    assert outputs_up_to_date([out], [src, tmp_path / "missing.json"]) is True
+    os.utime(src, ns=(out.stat().st_mtime_ns + 1, out.stat().st_mtime_ns + 1))
+    assert outputs_up_to_date([out], [src]) is False
+
+
+def test_write_lines_atomic_matches_joined_text(tmp_path):
+    """write_lines_atomic writes the same bytes as the joined string and returns the byte count."""
+    lines = ["Report ≥ 1", "", "| A | B |", "end"]
+    path = tmp_path / "report.txt"
+    size = write_lines_atomic(path, lines)
+    assert path.read_bytes() == "\n".join(lines).encode("utf-8")
+    assert size == path.stat().st_size
+    assert write_lines_atomic(tmp_path / "empty.txt", []) == 0
+
+
+def test_partial_lines_writer_matches_joined_text_and_keeps_partial_on_error(tmp_path):
+    """Blocks written incrementally give the joined text; an error leaves the .partial file, not the target."""
+    path = tmp_path / "report.txt"
+    with PartialLinesWriter(path) as out:
+        out.write(["header", ""])
+        assert (tmp_path / "report.txt.partial").read_text(encoding="utf-8") == "header\n"
+        out.write(["### A\nbody", "≥ done"])
+    assert path.read_text(encoding="utf-8") == "\n".join(["header", "", "### A\nbody", "≥ done"])
+    assert out.size_bytes == path.stat().st_size
+    assert not (tmp_path / "report.txt.partial").exists()
+
+    failed = tmp_path / "failed.txt"
+    with pytest.raises(RuntimeError):
+        with PartialLinesWriter(failed) as out:
+            out.write(["first block"])
+            raise RuntimeError("crash")
+    assert not failed.exists()
+    assert (tmp_path / "failed.txt.partial").read_text(encoding="utf-8") == "first block"
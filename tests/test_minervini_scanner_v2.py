@@ -1,4 +1,5 @@
 """Tests for MinerviniScannerV2 (eligibility, reject result, grade bands)."""
+import numpy as np
 import pandas as pd
 import pytest
 from unittest.mock import MagicMock
@@ -62,3 +63,46 @@ def test_grade_from_composite_bands():
     assert scanner._grade_from_composite(55.0) == "C"
     assert scanner._grade_from_composite(54.9) == "REJECT"
     assert scanner._grade_from_composite(0.0) == "REJECT"
+
+
+def test_universe_rs_3m_returns_and_percentiles():
+    """universe_rs_3m gives each ticker's 3M return and its rank; short histories are skipped."""
+    closes = {
+        "UP": [100.0] * 240 + [150.0] * 60,
+        "FLAT": [100.0] * 300,
+        "SHORT": [100.0] * 10,
+    }
+    provider = MagicMock()
+    provider.get_historical_data.side_effect = lambda t, **kwargs: pd.DataFrame({"Close": closes[t]})
+    scanner = MinerviniScannerV2(provider, benchmark="^GDAXI")
+    returns_3m, percentiles = scanner.universe_rs_3m(["UP", "FLAT", "SHORT"])
+    assert set(returns_3m) == {"UP", "FLAT"}
+    assert returns_3m["UP"] == pytest.approx(50.0)
+    assert returns_3m["FLAT"] == pytest.approx(0.0)
+    assert percentiles["UP"] > percentiles["FLAT"]
+
+
+def test_universe_rs_3m_prefers_raw_arrays():
+    """Providers with get_raw_ohlcv are read without DataFrames; None falls back to get_historical_data."""
+    closes = {"UP": np.array([100.0] * 240 + [150.0] * 60), "FLAT": np.array([100.0] * 300)}
+
+    class RawProvider:
+        def __init__(self):
+            self.frames_requested = []
+
+        def get_raw_ohlcv(self, ticker):
+            if ticker not in closes:
+                return None
+            c = closes[ticker]
+            return (c, c, c, c, np.ones_like(c), None)
+
+        def get_historical_data(self, ticker, **kwargs):
+            self.frames_requested.append(ticker)
+            return pd.DataFrame({"Close": [100.0] * 240 + [80.0] * 60})
+
+    provider = RawProvider()
+    returns_3m, _ = MinerviniScannerV2(provider, benchmark="^GDAXI").universe_rs_3m(["UP", "FLAT", "DOWN"])
+    assert returns_3m["UP"] == pytest.approx(50.0)
+    assert returns_3m["FLAT"] == pytest.approx(0.0)
+    assert returns_3m["DOWN"] == pytest.approx(-20.0)
+    assert provider.frames_requested == ["DOWN"]
@@ -0,0 +1,327 @@
+"""Tests for openai_utils module."""
+import time
+
+import pytest
+
+import openai_utils
+from openai_utils import require_openai_api_key, send_many
+
+
+@pytest.fixture(autouse=True)
+def _fresh_clients():
+    """Tests swap in fake OpenAI classes; drop clients shared from earlier tests."""
+    openai_utils._clients.clear()
+    yield
+    openai_utils._clients.clear()
+
+
+def test_require_openai_api_key_missing_exits(monkeypatch):
+    """Without argument or OPENAI_API_KEY, require_openai_api_key raises SystemExit."""
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    with pytest.raises(SystemExit):
+        require_openai_api_key(None)
+
+
+def test_send_many_preserves_prompt_order(monkeypatch):
+    """send_many returns results in prompt order even when requests finish out of order."""
+    def fake_send(prompt, api_key, **kwargs):
+        time.sleep(0.01 * (3 - int(prompt)))
+        return (f"answer {prompt}", None)
+
+    monkeypatch.setattr(openai_utils, "send_to_chatgpt", fake_send)
+    done = []
+    results = send_many(["0", "1", "2"], "key", max_workers=3, on_done=lambda i, r: done.append(i))
+    assert [r[0] for r in results] == ["answer 0", "answer 1", "answer 2"]
+    assert sorted(done) == [0, 1, 2]
+
+
+def test_send_many_failed_prompt_yields_none(monkeypatch):
+    """An exception for one prompt yields (None, None) for that prompt only."""
+    def fake_send(prompt, api_key, **kwargs):
+        if prompt == "bad":
+            raise RuntimeError("boom")
+        return ("ok", None)
+
+    monkeypatch.setattr(openai_utils, "send_to_chatgpt", fake_send)
+    assert send_many(["good", "bad"], "key") == [("ok", None), (None, None)]
+
+
+def test_send_many_sends_duplicate_prompts_once(monkeypatch):
+    """Identical prompts are sent once; every index gets the shared response and an on_done call."""
+    sent = []
+
+    def fake_send(prompt, api_key, **kwargs):
+        sent.append(prompt)
+        return (f"answer {prompt}", None)
+
+    monkeypatch.setattr(openai_utils, "send_to_chatgpt", fake_send)
+    done = []
+    results = send_many(["a", "b", "a"], "key", on_done=lambda i, r: done.append(i))
+    assert sorted(sent) == ["a", "b"]
+    assert [r[0] for r in results] == ["answer a", "answer b", "answer a"]
+    assert sorted(done) == [0, 1, 2]
+
+
+class _FakeExc(Exception):
+    def __init__(self, headers):
+        super().__init__("rate limited")
+        self.response = type("R", (), {"headers": headers})()
+
+
+def test_backoff_prefers_retry_after_header():
+    """A retry-after / retry-after-ms header overrides the computed backoff."""
+    assert openai_utils._backoff_seconds(0, _FakeExc({"retry-after": "7"})) == 7.0
+    assert openai_utils._backoff_seconds(0, _FakeExc({"retry-after-ms": "1500"})) == 1.5
+
+
+def test_backoff_is_exponential_and_capped(monkeypatch):
+    """Without a header the wait doubles per attempt and never exceeds the cap (plus jitter)."""
+    monkeypatch.setattr(openai_utils, "OPENAI_CHATGPT_RETRY_BASE_SECONDS", 2)
+    monkeypatch.setattr(openai_utils, "OPENAI_CHATGPT_RETRY_MAX_SECONDS", 10)
+    exc = _FakeExc({})
+    assert 2 <= openai_utils._backoff_seconds(0, exc) < 3
+    assert 8 <= openai_utils._backoff_seconds(2, exc) < 9
+    assert 10 <= openai_utils._backoff_seconds(5, exc) < 11
+
+
+def test_estimate_tokens_fallback_without_tiktoken(monkeypatch):
+    """Without tiktoken the estimate is ~4 characters per token."""
+    monkeypatch.setattr(openai_utils, "_token_encoder", lambda model: None)
+    assert openai_utils.estimate_tokens("") == 0
+    assert openai_utils.estimate_tokens("x" * 10) == 3
+
+
+def test_estimate_tokens_falls_back_when_encoding_cannot_load(monkeypatch):
+    """A tiktoken whose BPE file cannot be fetched (offline) falls back to ~4 chars per token."""
+    import sys
+    from types import SimpleNamespace
+
+    def fail(*args):
+        raise OSError("network unreachable")
+
+    monkeypatch.setitem(sys.modules, "tiktoken", SimpleNamespace(encoding_for_model=lambda model: fail(), get_encoding=fail))
+    openai_utils._token_encoder.cache_clear()
+    try:
+        assert openai_utils._token_encoder("offline-model") is None
+        assert openai_utils.estimate_tokens("x" * 10, model="offline-model") == 3
+    finally:
+        openai_utils._token_encoder.cache_clear()
+
+
+def test_send_to_chatgpt_skips_prompt_over_context(monkeypatch):
+    """A prompt larger than the context window is not sent."""
+    monkeypatch.setattr(openai_utils, "OPENAI_CHATGPT_CONTEXT_TOKENS", 10)
+    monkeypatch.setattr(openai_utils, "_token_encoder", lambda model: None)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("client must not be created")
+
+    import openai
+    monkeypatch.setattr(openai, "OpenAI", fail)
+    assert openai_utils.send_to_chatgpt("x" * 100, "key", use_cache=False) == (None, None)
+
+
+def _fake_openai_client(calls):
+    """OpenAI stand-in whose chat.completions.create records the call and returns 'answer'."""
+    from types import SimpleNamespace
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        message = SimpleNamespace(content="answer")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+    completions = SimpleNamespace(create=create)
+    return lambda api_key, **kwargs: SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+
+def test_send_to_chatgpt_cache_skips_identical_request(monkeypatch, tmp_path):
+    """A repeated identical prompt is answered from the disk cache; use_cache=False still calls the API."""
+    import openai
+    calls = []
+    monkeypatch.setattr(openai, "OpenAI", _fake_openai_client(calls))
+    monkeypatch.setattr(openai_utils, "OPENAI_CHATGPT_CACHE_DIR", tmp_path)
+
+    assert openai_utils.send_to_chatgpt("prompt", "key", model="m", use_cache=True) == ("answer", None)
+    assert openai_utils.send_to_chatgpt("prompt", "key", model="m", use_cache=True) == ("answer", None)
+    assert len(calls) == 1
+    assert len(list(tmp_path.glob("*.json"))) == 1
+
+    openai_utils.send_to_chatgpt("prompt", "key", model="m", use_cache=False)
+    assert len(calls) == 2
+    openai_utils.send_to_chatgpt("prompt", "key", model="other", use_cache=True)
+    assert len(calls) == 3
+    # A different completion limit is a different request (a shorter answer is not reused)
+    openai_utils.send_to_chatgpt("prompt", "key", model="m", max_tokens=50, use_cache=True)
+    assert len(calls) == 4
+
+
+def test_send_to_chatgpt_stream_calls_on_delta(monkeypatch):
+    """With on_delta the response is streamed chunk by chunk and the joined text is returned."""
+    from types import SimpleNamespace
+    import openai
+
+    def chunk(text=None, usage=None):
+        choices = [SimpleNamespace(delta=SimpleNamespace(content=text))] if text is not None else []
+        return SimpleNamespace(choices=choices, usage=usage)
+
+    def create(**kwargs):
+        assert kwargs["stream"] is True
+        usage = SimpleNamespace(prompt_tokens=3, completion_tokens=2, total_tokens=5)
+        return iter([chunk("Hel"), chunk("lo"), chunk(usage=usage)])
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(openai, "OpenAI", lambda api_key, **kwargs: client)
+    seen = []
+    content, usage = openai_utils.send_to_chatgpt("p", "key", use_cache=False, on_delta=seen.append)
+    assert content == "Hello"
+    assert seen == ["Hel", "lo"]
+    assert usage["total_tokens"] == 5
+
+
+def test_send_to_chatgpt_stream_retry_marks_restart(monkeypatch):
+    """A stream that fails midway is retried; on_delta gets the restart marker before the text repeats."""
+    from types import SimpleNamespace
+    import openai
+
+    def chunk(text):
+        return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))], usage=None)
+
+    def broken_stream():
+        yield chunk("Hel")
+        raise ConnectionError("stream dropped")
+
+    attempts = iter([broken_stream(), iter([chunk("Hel"), chunk("lo")])])
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=lambda **kwargs: next(attempts))))
+    monkeypatch.setattr(openai, "OpenAI", lambda api_key, **kwargs: client)
+    monkeypatch.setattr(openai_utils, "_retryable_errors", lambda: (ConnectionError,))
+    monkeypatch.setattr(openai_utils, "_backoff_seconds", lambda attempt, exc: 0.0)
+    monkeypatch.setattr(openai_utils.time, "sleep", lambda seconds: None)
+    seen = []
+    content, _ = openai_utils.send_to_chatgpt("p", "key", use_cache=False, on_delta=seen.append)
+    assert content == "Hello"
+    assert seen == ["Hel", openai_utils.STREAM_RESTART_MARKER, "Hel", "lo"]
+
+
+def test_request_timeout_scales_with_tokens(monkeypatch):
+    """Small requests get the base timeout; large ones get tokens / throughput."""
+    monkeypatch.setattr(openai_utils, "OPENAI_API_TIMEOUT", 60)
+    monkeypatch.setattr(openai_utils, "OPENAI_CHATGPT_TOKENS_PER_SECOND", 50)
+    assert openai_utils.request_timeout(100, 500) == 60
+    assert openai_utils.request_timeout(2000, 8000) == 200
+
+
+def test_rate_limiter_waits_for_capacity(monkeypatch):
+    """Requests beyond the RPM/TPM buckets wait for the refill instead of being sent."""
+    clock = [1000.0]
+    monkeypatch.setattr(openai_utils.time, "monotonic", lambda: clock[0])
+
+    def fake_sleep(seconds):
+        clock[0] += seconds
+
+    monkeypatch.setattr(openai_utils.time, "sleep", fake_sleep)
+
+    by_requests = openai_utils.RateLimiter(rpm=2, tpm=0)
+    assert by_requests.acquire(10**6) == 0.0
+    assert by_requests.acquire(10**6) == 0.0
+    assert by_requests.acquire(10**6) == pytest.approx(30.0)
+
+    by_tokens = openai_utils.RateLimiter(rpm=0, tpm=1000)
+    assert by_tokens.acquire(800) == 0.0
+    assert by_tokens.acquire(800) == pytest.approx(36.0)
+    # Larger than the bucket: waits for a full bucket rather than forever
+    assert by_tokens.acquire(5000) == pytest.approx(60.0)
+
+    assert openai_utils.RateLimiter(rpm=0, tpm=0).acquire(10**9) == 0.0
+
+
+def test_send_batch_maps_output_back_to_prompts(monkeypatch, tmp_path):
+    """send_batch submits one JSONL job and returns answers in prompt order; failures yield (None, None)."""
+    import json
+    from types import SimpleNamespace
+    import openai
+
+    uploaded = {}
+
+    def files_create(file, purpose):
+        uploaded["lines"] = [json.loads(line) for line in file[1].splitlines()]
+        return SimpleNamespace(id="file-in")
+
+    def output_line(custom_id, content):
+        body = {"choices": [{"message": {"content": content}}], "usage": {"prompt_tokens": 1, "completion_tokens": 2, "total_tokens": 3}}
+        return json.dumps({"custom_id": custom_id, "response": {"status_code": 200, "body": body}, "error": None})
+
+    states = iter(["in_progress", "completed"])
+    batch = lambda status: SimpleNamespace(id="b1", status=status, output_file_id="file-out", request_counts=None)
+    client = SimpleNamespace(
+        files=SimpleNamespace(
+            create=files_create,
+            # Malformed lines and unknown custom_ids are skipped without losing the good answers
+            content=lambda file_id: SimpleNamespace(text="\n".join((
+                output_line("2", "third"), "{not json", output_line("x", "junk"), output_line("9", "junk"),
+                output_line("-1", "junk"), output_line("0", "first"),
+            ))),
+        ),
+        batches=SimpleNamespace(
+            create=lambda **kwargs: batch("validating"),
+            retrieve=lambda batch_id: batch(next(states)),
+        ),
+    )
+    monkeypatch.setattr(openai, "OpenAI", lambda api_key, **kwargs: client)
+    monkeypatch.setattr(openai_utils.time, "sleep", lambda seconds: None)
+    monkeypatch.setattr(openai_utils, "OPENAI_CHATGPT_CACHE_DIR", tmp_path)
+
+    results = openai_utils.send_batch(["a", "b", "c"], "key", model="m", max_tokens=100, use_cache=True)
+    assert [r[0] for r in results] == ["first", None, "third"]
+    assert results[0][1]["total_tokens"] == 3
+    assert [line["custom_id"] for line in uploaded["lines"]] == ["0", "1", "2"]
+    assert uploaded["lines"][0]["body"]["max_completion_tokens"] == 100
+    # Answers were cached: a rerun only submits the prompt that failed
+    openai_utils.send_batch(["a", "b", "c"], "key", model="m", max_tokens=100, use_cache=True)
+    assert [line["custom_id"] for line in uploaded["lines"]] == ["1"]
+
+
+def test_cached_response_expires_after_ttl(monkeypatch, tmp_path):
+    """Cache entries older than the TTL are misses; ttl 0 never expires; clear_response_cache empties the dir."""
+    monkeypatch.setattr(openai_utils, "OPENAI_CHATGPT_CACHE_DIR", tmp_path)
+    path = openai_utils._cache_path("m", "prompt", None, 100)
+    openai_utils._write_cached_response(path, "answer", None)
+    now = time.time()
+    monkeypatch.setattr(openai_utils.time, "time", lambda: now + 3 * 3600)
+    assert openai_utils._read_cached_response(path, ttl_hours=24) == ("answer", None)
+    assert openai_utils._read_cached_response(path, ttl_hours=2) is None
+    assert openai_utils._read_cached_response(path, ttl_hours=0) == ("answer", None)
+    assert openai_utils.clear_response_cache() == 1
+    assert openai_utils._read_cached_response(path, ttl_hours=0) is None
+
+
+def test_get_client_is_shared_per_api_key(monkeypatch):
+    """One OpenAI client per API key is reused across calls."""
+    import openai
+    created = []
+    monkeypatch.setattr(openai, "OpenAI", lambda api_key, **kwargs: created.append(api_key) or object())
+    first = openai_utils._get_client("k1")
+    assert openai_utils._get_client("k1") is first
+    assert openai_utils._get_client("k2") is not first
+    assert created == ["k1", "k2"]
+
+
+def test_get_client_passes_pooled_http_client(monkeypatch):
+    """With httpx importable, the OpenAI client gets a pooled DefaultHttpxClient (HTTP/2 only when h2 is installed)."""
+    import sys
+    from types import SimpleNamespace
+    import openai
+
+    made = {}
+    fake_httpx = SimpleNamespace(
+        Limits=lambda **kwargs: kwargs,
+        Timeout=lambda *args, **kwargs: (args, kwargs),
+    )
+    monkeypatch.setitem(sys.modules, "httpx", fake_httpx)
+    # The SDK's DefaultHttpxClient (not a bare httpx.Client), so the SDK's client defaults are kept
+    monkeypatch.setattr(openai, "DefaultHttpxClient", lambda **kwargs: made.setdefault("http", kwargs), raising=False)
+    monkeypatch.setattr(openai_utils.importlib.util, "find_spec", lambda name: None)
+    monkeypatch.setattr(openai, "OpenAI", lambda api_key, **kwargs: made.setdefault("client", kwargs))
+    openai_utils._get_client("k")
+    assert made["client"]["http_client"] is made["http"]
+    assert made["http"]["http2"] is False
+    assert made["http"]["limits"]["max_connections"] == openai_utils.OPENAI_HTTP_MAX_CONNECTIONS
@@ -32,3 +32,13 @@ def test_get_possible_ticker_formats():
 def test_get_possible_ticker_formats_no_suffixes():
     formats = get_possible_ticker_formats("WTAI", include_exchange_suffixes=False)
     assert formats == ["WTAI"]
+
+
+def test_lookup_ticker_index_matches_first_key_in_order():
+    """Index lookups return the earliest key matching case-insensitively or after cleaning."""
+    from ticker_utils import build_ticker_index, lookup_ticker_index
+    stocks = {"asmla_EQ": "first", "ASMLA": "second", "rwe.de": "third"}
+    index = build_ticker_index(stocks)
+    assert lookup_ticker_index(index, "ASMLA", "ASMLA") == "first"
+    assert lookup_ticker_index(index, "RWE.DE", "RWE.DE") == "third"
+    assert lookup_ticker_index(index, "NOPE", "NOPE") is None
@@ -3,8 +3,7 @@ Ticker Utility Module
 Centralized ticker cleaning and mapping logic for consistent handling across all modules.
 Mappings can be edited in data/ticker_mapping.json (see reportsV2/ticker_mapping_errors.txt for failures).
 """
-import json
-from typing import Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 
 # Built-in defaults (also kept in data/ticker_mapping.json so file can be edited)
 TICKER_MAPPING = {
@@ -17,10 +16,10 @@ def _load_ticker_mapping_from_file() -> Dict[str, str]:
     """Load ticker mapping from config file. Returns {} if file missing or invalid."""
     try:
         from config import TICKER_MAPPING_FILE
+        from file_utils import read_json
         if not TICKER_MAPPING_FILE.exists():
             return {}
-        with open(TICKER_MAPPING_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        data = read_json(TICKER_MAPPING_FILE)
         if not isinstance(data, dict):
             return {}
         return {str(k).upper(): str(v).upper() for k, v in data.items()}
@@ -76,6 +75,33 @@ def clean_ticker(ticker: str, use_mapping: bool = True) -> str:
     return ticker_upper
 
 
+# (uppercase key -> (position, value), clean_ticker key -> (position, value)) for a symbol-keyed dict
+TickerIndex = Tuple[Dict[str, Tuple[int, Any]], Dict[str, Tuple[int, Any]]]
+
+
+def build_ticker_index(by_symbol: Dict[str, Any]) -> TickerIndex:
+    """
+    Normalized lookup tables for a symbol-keyed dict (e.g. the stock cache), built once per run
+    instead of scanning (and re-cleaning) every key per lookup. The first key in dict order wins per form.
+    """
+    by_upper: Dict[str, Tuple[int, Any]] = {}
+    by_clean: Dict[str, Tuple[int, Any]] = {}
+    for pos, (key, value) in enumerate(by_symbol.items()):
+        by_upper.setdefault(key.upper(), (pos, value))
+        by_clean.setdefault(clean_ticker(key) or key, (pos, value))
+    return by_upper, by_clean
+
+
+def lookup_ticker_index(index: TickerIndex, symbol_upper: str, cleaned: str) -> Optional[Any]:
+    """
+    Value of the first key (in dict order) whose uppercase form is symbol_upper or whose
+    clean_ticker form is cleaned; same result as scanning the keys in order. None if no key matches.
+    """
+    by_upper, by_clean = index
+    hits = [hit for hit in (by_upper.get(symbol_upper), by_clean.get(cleaned)) if hit is not None]
+    return min(hits, key=lambda hit: hit[0])[1] if hits else None
+
+
 def get_possible_ticker_formats(ticker: str, include_exchange_suffixes: bool = True) -> List[str]:
     """
     Generate a list of possible ticker formats to try when searching for stock data.
@@ -1,6 +1,6 @@
 """
 Watchlist loader: CSV (type, yahoo_symbol, trading212_symbol, benchmark_index) or legacy one-symbol-per-line.
-Used by 01 (fetch) and 03 (prepare for Minervini).
+Used by 01 (fetch), 03 (prepare for Minervini) and 05 (Trading212 -> Yahoo map).
 """
 import csv
 from pathlib import Path
@@ -8,6 +8,7 @@ from typing import List, Dict, Any
 
 from logger_config import get_logger
 from benchmark_mapping import get_benchmark
+from file_utils import load_with_sidecar
 
 logger = get_logger(__name__)
 
@@ -20,39 +21,53 @@ BENCHMARK_INDEX = "benchmark_index"
 VALID_TYPES = ("ticker", "index")
 
 
-def load_watchlist_csv(path: str) -> List[Dict[str, str]]:
-    """
-    Load watchlist from CSV. Columns: type, yahoo_symbol, trading212_symbol, benchmark_index.
-    type must be 'ticker' or 'index'. Returns list of dicts with keys normalized (strip, uppercase where needed).
-    """
+def _parse_watchlist_csv(p: Path) -> List[Dict[str, str]]:
+    """Parse the CSV rows in one pass over column indices; benchmark_index stays "" where the CSV has none."""
     out: List[Dict[str, str]] = []
-    p = Path(path)
-    if not p.exists():
-        logger.error("Watchlist CSV not found: %s", path)
-        return []
     with open(p, "r", encoding="utf-8", newline="") as f:
-        reader = csv.DictReader(f)
-        if not reader.fieldnames:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if not header:
             return []
-        # Normalize field names (strip, lowercase)
-        fieldmap = {fn.strip().lower().replace(" ", "_"): fn for fn in reader.fieldnames}
+        # Normalize field names (strip, lowercase); a missing column reads the "" appended to every row
+        width = len(header)
+        col = {fn.strip().lower().replace(" ", "_"): i for i, fn in enumerate(header)}
+        i_type, i_yahoo, i_t212, i_bench = (
+            col.get(name, -1) for name in ("type", "yahoo_symbol", "trading212_symbol", "benchmark_index")
+        )
+        pad = [""] * width
         for row in reader:
-            raw_type = (row.get(fieldmap.get("type", "type")) or "").strip().lower()
-            yahoo = (row.get(fieldmap.get("yahoo_symbol", "yahoo_symbol")) or "").strip().upper()
-            t212 = (row.get(fieldmap.get("trading212_symbol", "trading212_symbol")) or "").strip().upper()
-            bench = (row.get(fieldmap.get("benchmark_index", "benchmark_index")) or "").strip().upper()
+            if len(row) < width:
+                row += pad[len(row):]
+            row.append("")
+            yahoo = row[i_yahoo].strip().upper()
             if not yahoo:
                 continue
-            if raw_type not in VALID_TYPES:
-                raw_type = "ticker"
-            if not bench and yahoo:
-                bench = get_benchmark(yahoo, None) or "^GDAXI"
+            raw_type = row[i_type].strip().lower()
             out.append({
-                TYPE: raw_type,
+                TYPE: raw_type if raw_type in VALID_TYPES else "ticker",
                 YAHOO_SYMBOL: yahoo,
-                TRADING212_SYMBOL: t212 or "",
-                BENCHMARK_INDEX: bench or "^GDAXI",
+                TRADING212_SYMBOL: row[i_t212].strip().upper(),
+                BENCHMARK_INDEX: row[i_bench].strip().upper(),
             })
+    return out
+
+
+def load_watchlist_csv(path: str) -> List[Dict[str, str]]:
+    """
+    Load watchlist from CSV. Columns: type, yahoo_symbol, trading212_symbol, benchmark_index.
+    type must be 'ticker' or 'index'. Returns list of dicts with keys normalized (strip, uppercase where needed).
+    The parsed rows are kept in a sidecar (load_with_sidecar), so an unchanged CSV is not re-parsed.
+    """
+    p = Path(path)
+    if not p.exists():
+        logger.error("Watchlist CSV not found: %s", path)
+        return []
+    out = load_with_sidecar(p, _parse_watchlist_csv)
+    # Default benchmarks are resolved after loading so the sidecar never holds a stale mapping
+    for r in out:
+        if not r[BENCHMARK_INDEX]:
+            r[BENCHMARK_INDEX] = get_benchmark(r[YAHOO_SYMBOL], None) or "^GDAXI"
     logger.info("Loaded %d rows from watchlist CSV %s", len(out), path)
     return out
 